@@ -1,46 +1,214 @@
-from fastapi import APIRouter, HTTPException
-from celery.result import AsyncResult
-from app.tasks import full_review_workflow_task
-from app.config import get_cache_client
-from app.db import get_analysis_by_id
-from datetime import timedelta
-from app.models import AnalyzePRRequest
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.tasks import full_review_workflow_task, batch_review_task
+from app.config import get_async_redis, get_github_service, get_settings, open_stream_redis
+from app.services.submission import submission_key, claim_submission_async, release_submission_async
+from app.services.task_status import get_task_status_async, get_task_statuses_async
+from app.services.batches import load_batch, summarize_batch
+from app.services.routing import choose_queue, estimate_review_cost, queue_metrics
+from app.services.metrics import METRICS_CONTENT_TYPE, render_metrics
+from app.services.result_cache import get_cached_result
+from app.services.review_events import events_key, publish_event_async, read_events
+from app.db import get_analysis_by_id_async, list_analyses_async
+from app.models import AnalyzePRRequest, AnalyzeBatchRequest
+from uuid import uuid4
 import json
+import time
 
 
 router = APIRouter()
 
 @router.post("/analyze-pr")
-def analyze_pr(payload: AnalyzePRRequest):
+async def analyze_pr(payload: AnalyzePRRequest):
+    repo_url = str(payload.repo_url)
     try:
-        task = full_review_workflow_task.apply_async(
-            args=[str(payload.repo_url), payload.pr_number]
+        settings = get_settings()
+        cache_client = get_async_redis()
+        # The server's service, so the head SHA the dedup key is built from is
+        # the one the worker (which always uses GITHUB_TOKEN) will review.
+        github_service = get_github_service()
+        pr_summary = await run_in_threadpool(github_service.get_pr_summary, repo_url, payload.pr_number)
+        head_sha = pr_summary.head_sha
+
+        # Identical submissions for the same PR head share one task.
+        key = submission_key(repo_url, payload.pr_number, head_sha)
+        task_id = str(uuid4())
+        existing_task_id = await claim_submission_async(cache_client, key, task_id, settings.SUBMISSION_TTL_SECONDS)
+        if existing_task_id is not None:
+            return {"task_id": existing_task_id, "deduplicated": True}
+
+        # Large PRs go to their own queue so they never hold up small ones.
+        queue = choose_queue(estimate_review_cost(pr_summary), settings.ROUTING_LARGE_COST_THRESHOLD)
+        # Opens the task's event stream before the worker can publish to it,
+        # so /stream can tell a queued task from an unknown one.
+        await publish_event_async(
+            cache_client, task_id, "queued", {"queue": queue},
+            ttl_seconds=settings.REVIEW_EVENTS_TTL_SECONDS,
+            maxlen=settings.REVIEW_EVENTS_MAXLEN,
         )
-        return {"task_id": task.id}
+        try:
+            await run_in_threadpool(
+                full_review_workflow_task.apply_async,
+                args=[repo_url, payload.pr_number],
+                task_id=task_id,
+                queue=queue,
+                headers={"enqueued_at": time.time()}
+            )
+        except Exception:
+            await cache_client.delete(events_key(task_id))
+            await release_submission_async(cache_client, key, task_id)
+            raise
+        return {"task_id": task_id, "deduplicated": False, "queue": queue}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error starting review workflow: {e}")
 
+@router.post("/analyze-batch")
+async def analyze_batch(payload: AnalyzeBatchRequest):
+    """Review a list of PRs (or every open PR) of one repository against a single shared index."""
+    if payload.all_open == bool(payload.pr_numbers):
+        raise HTTPException(status_code=400, detail="Pass either pr_numbers or all_open=true")
+    repo_url = str(payload.repo_url)
+    pr_numbers = None if payload.all_open else sorted(set(payload.pr_numbers))
+    batch_id = str(uuid4())
+    try:
+        await run_in_threadpool(
+            batch_review_task.apply_async,
+            args=[repo_url, pr_numbers],
+            task_id=batch_id,
+            headers={"enqueued_at": time.time()}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error starting batch review: {e}")
+    return {"batch_id": batch_id}
+
+@router.get("/batch/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """Aggregate progress of a batch; per-PR results are at /results/{task_id}."""
+    batch = await load_batch(get_async_redis(), batch_id)
+    if batch is None:
+        # The batch task has not fanned out yet (still listing PRs or indexing), or failed doing so.
+        status = (await get_task_status_async(batch_id))["status"]
+        return {"batch_id": batch_id, "status": status, "done": status in ("FAILURE", "REVOKED"), "tasks": []}
+
+    tasks = batch["tasks"]
+    statuses = await get_task_statuses_async([task["task_id"] for task in tasks])
+    return {"batch_id": batch_id, "repo_url": batch["repo_url"], "status": "FANNED_OUT", **summarize_batch(tasks, statuses)}
+
+@router.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics of this API process (GitHub calls made while routing submissions)."""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@router.get("/metrics/queues")
+async def get_queue_metrics():
+    """Depth and recent wait/run/total latency percentiles of each review queue."""
+    settings = get_settings()
+    return await queue_metrics(get_async_redis(), get_async_redis(settings.CELERY_BROKER_URL))
+
 @router.get("/status/{task_id}")
-def get_status(task_id: str):
-    task_result = AsyncResult(task_id)
-    return {"task_id": task_id, "status": task_result.status}
+async def get_status(task_id: str):
+    return await get_task_status_async(task_id)
 
-@router.get("/results/{task_id}")
-def get_results(task_id: str):
+def _format_sse(event_id, event: str, data: dict) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+@router.get("/stream/{task_id}")
+async def stream_review(task_id: str, request: Request):
+    """Server-sent events with per-file review results and progress as the worker produces them."""
+    redis_client = get_async_redis()
+    last_event_id = request.headers.get("last-event-id", "0")
+    key = events_key(task_id)
 
-    cache_client = get_cache_client()
+    # Celery reports unknown task ids as PENDING; queued tasks are told apart by their stream.
+    if not await redis_client.exists(key) and (await get_task_status_async(task_id))["status"] == "PENDING":
+        raise HTTPException(status_code=404, detail="Task not found or its events expired")
 
-    cached_result = cache_client.get(task_id)
-    if cached_result:
+    async def event_source():
+        # Blocking reads get their own connection so open streams never drain the shared pool.
+        stream_client = open_stream_redis()
         try:
-            return {"task_id": task_id, "result": json.loads(cached_result.decode("utf-8"))}
-        except Exception as exc:
-            raise HTTPException(status_code=500, detail=f"Cached result parse error: {exc}")
+            async for item in read_events(stream_client, task_id, last_event_id):
+                if await request.is_disconnected():
+                    return
+                if item is None:
+                    status = (await get_task_status_async(task_id))["status"]
+                    if status in ("SUCCESS", "FAILURE", "REVOKED"):
+                        # Finished without a terminal event in the stream (e.g. it already expired).
+                        yield _format_sse(None, "complete" if status == "SUCCESS" else "error", {"status": status})
+                        return
+                    if status == "PENDING" and not await redis_client.exists(key):
+                        # The stream expired while the task never ran (or was lost); nothing more will come.
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                event_id, event, data = item
+                yield _format_sse(event_id, event, data)
+        finally:
+            await stream_client.aclose()
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    # If not found in cache, fetch from database
-    analysis_result = get_analysis_by_id(task_id)
+@router.get("/results/{task_id}")
+async def get_results(task_id: str):
+
+    # Fresh results are cached for a short while after completion; older ones
+    # are read from the database and not cached again, so Redis only holds recent work.
+    try:
+        cached_result = await get_cached_result(get_async_redis(), task_id)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Cached result parse error: {exc}")
+    if cached_result is not None:
+        return {"task_id": task_id, "result": cached_result}
+
+    analysis_result = await get_analysis_by_id_async(task_id)
     if analysis_result:
-        cache_client.setex(task_id, timedelta(minutes=5), json.dumps(analysis_result.result))
-        return {"task_id": task_id, "result": analysis_result.result}
+        return {"task_id": task_id, "result": analysis_result.payload}
     else:
         raise HTTPException(status_code=404, detail="Task result not found")
+
+def _analysis_summary(analysis, include_result: bool) -> dict:
+    result = analysis.payload or {}
+    item = {
+        "task_id": analysis.task_id,
+        "repo_url": analysis.repo_url,
+        "pr_number": analysis.pr_number,
+        "head_sha": analysis.head_sha,
+        "created_at": analysis.created_at.isoformat(),
+        "summary": result.get("pr_review", {}).get("summary", {}),
+    }
+    if include_result:
+        item["result"] = result
+    return item
+
+@router.get("/analyses")
+async def list_analyses(
+    repo_url: str,
+    pr_number: Optional[int] = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_result: bool = False,
+):
+    """Analysis history of a repository or one PR, newest first; pass `next_cursor` back as `cursor` for the next page."""
+    try:
+        analyses, next_cursor = await list_analyses_async(repo_url, pr_number, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {exc}")
+    return {
+        "items": [_analysis_summary(analysis, include_result) for analysis in analyses],
+        "next_cursor": next_cursor,
+    }
+
+@router.get("/analyses/latest")
+async def get_latest_analysis(repo_url: str, pr_number: int):
+    analyses, _ = await list_analyses_async(repo_url, pr_number, limit=1)
+    if not analyses:
+        raise HTTPException(status_code=404, detail="No analysis found for this PR")
+    return _analysis_summary(analyses[0], include_result=True)
@@ -1,2 +1,3 @@
 from .settings import get_settings
-from .dependency import get_github_service, get_code_review_agent, get_celery_app, get_cache_client
\ No newline at end of file
+from .dependency import get_github_service, get_code_review_agent, get_celery_app, get_cache_client, init_dependencies, close_dependencies
+from .dependency import get_async_redis, open_stream_redis, close_async_dependencies
\ No newline at end of file
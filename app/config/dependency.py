@@ -1,10 +1,18 @@
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Optional
+import threading
 from celery import Celery
 from app.config import get_settings
 from app.services import GithubService 
 from app.services import CodeReviewAgent
-from redis import Redis
+from app.services.git_mirror import GitMirrorSource
+from app.services.cache import ReviewCache, build_cache_backend
+from app.services.embeddings import EmbeddingStore
+from app.services.file_filter import FileFilter, split_patterns
+from app.services.routing import LARGE_QUEUE, SMALL_QUEUE
+from redis import ConnectionPool, Redis
 from redis import ConnectionError
+from redis import asyncio as aioredis
 
 
 def _require_setting(value: Optional[str], setting_name: str) -> str:
@@ -13,26 +21,176 @@ def _require_setting(value: Optional[str], setting_name: str) -> str:
     raise RuntimeError(f"Missing required setting: {setting_name}")
 
 
-def get_github_service(github_token: Optional[str] = None) -> GithubService:
+class DependencyContainer:
+    """
+    Process-wide clients, built on first use and reused by every request or task.
+
+    Celery worker processes and the API process call `init_dependencies()` on
+    start and `close_dependencies()` on shutdown; prefork children re-initialize
+    so no sockets are shared across fork.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.redis_pool: Optional[ConnectionPool] = None
+        self.async_redis_pools: Dict[str, aioredis.BlockingConnectionPool] = {}
+        self.github_service: Optional[GithubService] = None
+        self.code_review_agents: Dict[str, CodeReviewAgent] = {}
+
+    def reset(self):
+        with self.lock:
+            if self.redis_pool is not None:
+                self.redis_pool.disconnect()
+            self.redis_pool = None
+            # Async pools are bound to their event loop; close_async_dependencies() disconnects them.
+            self.async_redis_pools = {}
+            self.github_service = None
+            self.code_review_agents = {}
+
+
+_container = DependencyContainer()
+
+
+def init_dependencies() -> None:
+    """Drop anything inherited from a parent process and open a fresh Redis pool."""
+    _container.reset()
+    try:
+        get_cache_client().ping()
+    except ConnectionError as exc:
+        raise RuntimeError("Redis connection error") from exc
+
+
+def close_dependencies() -> None:
+    _container.reset()
+
+
+async def close_async_dependencies() -> None:
+    with _container.lock:
+        pools = list(_container.async_redis_pools.values())
+        _container.async_redis_pools = {}
+    for pool in pools:
+        await pool.disconnect()
+
+
+def _build_file_filter(settings) -> FileFilter:
+    detection = {}
+    if not settings.FILE_SKIP_DETECTED:
+        detection = {"binary_extensions": (), "generated_patterns": (), "vendored_directories": ()}
+    return FileFilter(
+        include=split_patterns(settings.FILE_INCLUDE_PATTERNS),
+        exclude=split_patterns(settings.FILE_EXCLUDE_PATTERNS),
+        max_file_bytes=settings.FILE_MAX_BYTES,
+        **detection,
+    )
 
+
+def _build_github_service(settings, token: str) -> GithubService:
+    repo_source = None
+    if settings.REPO_SOURCE == "mirror":
+        repo_source = GitMirrorSource(
+            root_dir=settings.REPO_MIRROR_DIR,
+            github_token=token,
+            fetch_interval_seconds=settings.REPO_MIRROR_FETCH_INTERVAL_SECONDS,
+        )
+    elif settings.REPO_SOURCE != "api":
+        raise RuntimeError(f"Unsupported REPO_SOURCE: {settings.REPO_SOURCE}")
+    http_cache = build_cache_backend(
+        settings.GITHUB_HTTP_CACHE_BACKEND,
+        namespace="github-http",
+        directory=settings.GITHUB_HTTP_CACHE_DIR,
+        max_bytes=settings.GITHUB_HTTP_CACHE_MAX_BYTES,
+        redis_client=get_cache_client() if settings.GITHUB_HTTP_CACHE_BACKEND == "redis" else None,
+    )
+    blob_cache = build_cache_backend(
+        settings.GITHUB_BLOB_CACHE_BACKEND,
+        namespace="github-blob",
+        directory=settings.GITHUB_HTTP_CACHE_DIR,
+        max_bytes=settings.GITHUB_BLOB_CACHE_MAX_BYTES,
+        redis_client=get_cache_client() if settings.GITHUB_BLOB_CACHE_BACKEND == "redis" else None,
+    )
+    return GithubService(
+        token,
+        repo_source=repo_source,
+        file_filter=_build_file_filter(settings),
+        http_cache=http_cache,
+        http_cache_ttl_seconds=settings.GITHUB_HTTP_CACHE_TTL_SECONDS,
+        blob_cache=blob_cache,
+        blob_cache_ttl_seconds=settings.GITHUB_BLOB_CACHE_TTL_SECONDS,
+        blob_cache_max_entry_bytes=settings.GITHUB_BLOB_CACHE_MAX_ENTRY_BYTES,
+        content_fetch_concurrency=settings.GITHUB_FETCH_CONCURRENCY,
+        fetch_blobs_by_sha=settings.GITHUB_FETCH_BLOBS_BY_SHA,
+        fetch_max_retries=settings.GITHUB_FETCH_MAX_RETRIES,
+        fetch_retry_base_delay=settings.GITHUB_FETCH_RETRY_BASE_DELAY_SECONDS,
+    )
+
+
+def get_github_service(github_token: Optional[str] = None) -> GithubService:
+    """
+    The process-wide service for the server's GITHUB_TOKEN. A different
+    `github_token` gets a fresh, uncached service, so caller-supplied tokens
+    never accumulate clients, caches or mirrors in the process.
+    """
     settings = get_settings()
-    token = _require_setting(github_token or settings.GITHUB_TOKEN, "GITHUB_TOKEN")
-    return GithubService(token)
+    if github_token and github_token != settings.GITHUB_TOKEN:
+        return _build_github_service(settings, github_token)
+    token = _require_setting(settings.GITHUB_TOKEN, "GITHUB_TOKEN")
+    with _container.lock:
+        if _container.github_service is None:
+            _container.github_service = _build_github_service(settings, token)
+        return _container.github_service
 
 
 def get_code_review_agent(api_key: Optional[str] = None) -> CodeReviewAgent:
 
     settings = get_settings()
     gemini_key = _require_setting(api_key or settings.GEMINI_API_KEY, "GEMINI_API_KEY")
-    github_service = get_github_service()
-    return CodeReviewAgent(
-        github_service=github_service,
-        api_key=gemini_key,
-        chat_model=settings.GEMINI_CHAT_MODEL,
-        embedding_model=settings.GEMINI_EMBEDDING_MODEL,
-    )
-
-
+    with _container.lock:
+        code_review_agent = _container.code_review_agents.get(gemini_key)
+        if code_review_agent is not None:
+            return code_review_agent
+
+        github_service = get_github_service()
+        review_cache = None
+        backend = build_cache_backend(
+            settings.REVIEW_CACHE_BACKEND,
+            namespace="review",
+            max_entries=settings.REVIEW_CACHE_MAX_ENTRIES,
+            directory=settings.REVIEW_CACHE_DIR,
+            max_bytes=settings.REVIEW_CACHE_MAX_BYTES,
+            redis_client=get_cache_client() if settings.REVIEW_CACHE_BACKEND == "redis" else None,
+        )
+        if backend is not None:
+            review_cache = ReviewCache(backend, ttl_seconds=settings.REVIEW_CACHE_TTL_SECONDS)
+        embedding_store = None
+        if settings.EMBEDDING_CACHE_PATH:
+            embedding_store = EmbeddingStore(settings.EMBEDDING_CACHE_PATH, max_rows=settings.EMBEDDING_CACHE_MAX_ROWS)
+        code_review_agent = CodeReviewAgent(
+            github_service=github_service,
+            api_key=gemini_key,
+            chat_model=settings.GEMINI_CHAT_MODEL,
+            embedding_model=settings.GEMINI_EMBEDDING_MODEL,
+            index_dir=settings.REPO_INDEX_DIR,
+            index_max_age_seconds=settings.REPO_INDEX_MAX_AGE_SECONDS,
+            index_max_bytes=settings.REPO_INDEX_MAX_BYTES,
+            review_concurrency=settings.REVIEW_CONCURRENCY,
+            llm_max_retries=settings.LLM_MAX_RETRIES,
+            llm_retry_base_delay=settings.LLM_RETRY_BASE_DELAY_SECONDS,
+            review_cache=review_cache,
+            embedding_store=embedding_store,
+            embedding_batch_size=settings.EMBEDDING_BATCH_SIZE,
+            embedding_concurrency=settings.EMBEDDING_CONCURRENCY,
+            index_batch_chunks=settings.INDEX_BATCH_CHUNKS,
+            index_queue_size=settings.INDEX_QUEUE_SIZE,
+            max_open_indexes=settings.REPO_INDEX_MAX_OPEN,
+            file_max_retries=settings.REVIEW_FILE_MAX_RETRIES,
+            large_file_lines=settings.REVIEW_LARGE_FILE_LINES,
+            hunk_context_lines=settings.REVIEW_HUNK_CONTEXT_LINES,
+        )
+        _container.code_review_agents[gemini_key] = code_review_agent
+        return code_review_agent
+
+
+@lru_cache
 def get_celery_app() -> Celery:
 
     settings = get_settings()
@@ -47,7 +205,13 @@ def get_celery_app() -> Celery:
         result_serializer="json",
         accept_content=["json"],
         timezone="UTC",
-        enable_utc=True
+        enable_utc=True,
+        # Reviews are routed per call (see app.services.routing); anything else goes to the small queue.
+        task_default_queue=SMALL_QUEUE,
+        task_routes={"app.tasks.analyze.batch_review_task": {"queue": LARGE_QUEUE}},
+        worker_prefetch_multiplier=settings.CELERY_WORKER_PREFETCH_MULTIPLIER,
+        # Tasks return small result references; full results live in Postgres.
+        result_expires=settings.CELERY_RESULT_EXPIRES_SECONDS,
     )
 
     return celery_app
@@ -55,13 +219,37 @@ def get_celery_app() -> Celery:
 def get_cache_client() -> Redis:
 
     settings = get_settings()
-    redis_client_url = settings.REDIS_CLIENT_URL
-    try:
-        cache_client = Redis.from_url(redis_client_url)
-        ping = cache_client.ping()
-        if ping is True:
-            return cache_client
-    except ConnectionError as exc:
-        raise RuntimeError("Redis connection error") from exc
+    with _container.lock:
+        if _container.redis_pool is None:
+            _container.redis_pool = ConnectionPool.from_url(settings.REDIS_CLIENT_URL)
+        pool = _container.redis_pool
+    # Clients are cheap views over the shared pool; connections are checked out per command.
+    return Redis(connection_pool=pool)
 
-    raise RuntimeError("Redis ping failed")
+
+def get_async_redis(redis_url: Optional[str] = None) -> aioredis.Redis:
+
+    settings = get_settings()
+    redis_url = redis_url or settings.REDIS_CLIENT_URL
+    with _container.lock:
+        pool = _container.async_redis_pools.get(redis_url)
+        if pool is None:
+            # Blocking, so a burst of polls beyond max_connections queues for a
+            # connection instead of failing with "Too many connections".
+            pool = aioredis.BlockingConnectionPool.from_url(
+                redis_url,
+                max_connections=settings.REDIS_ASYNC_MAX_CONNECTIONS,
+                timeout=settings.REDIS_ASYNC_POOL_TIMEOUT_SECONDS,
+            )
+            _container.async_redis_pools[redis_url] = pool
+    return aioredis.Redis(connection_pool=pool)
+
+
+def open_stream_redis(redis_url: Optional[str] = None) -> aioredis.Redis:
+    """
+    A client on its own connection, outside the shared pools, for commands that
+    block for long (stream reads). Held by the pool, each open SSE stream would
+    take a connection from /status and /results. The caller closes it with `aclose()`.
+    """
+    settings = get_settings()
+    return aioredis.Redis.from_url(redis_url or settings.REDIS_CLIENT_URL, single_connection_client=True)
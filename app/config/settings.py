@@ -2,6 +2,7 @@ from pydantic_settings import BaseSettings
 from typing import Optional
 from pydantic import Field, PostgresDsn
 from enum import Enum
+from functools import lru_cache
 
 class EnvironmentType(str, Enum):
     DEVELOPMENT = "development"
@@ -52,6 +53,67 @@ class Settings(BaseSettings):
         description="Gemini embedding model name"
     )
 
+    REVIEW_CONCURRENCY: int = Field(
+        default=4,
+        description="Maximum number of files reviewed by the LLM in parallel"
+    )
+
+    LLM_MAX_RETRIES: int = Field(
+        default=3,
+        description="Retries for LLM calls rejected by rate limits"
+    )
+
+    LLM_RETRY_BASE_DELAY_SECONDS: float = Field(
+        default=2.0,
+        description="Initial backoff before retrying a rate-limited LLM call"
+    )
+
+    REVIEW_FILE_MAX_RETRIES: int = Field(
+        default=2,
+        description="Retries for a single file review that raises, before the task retries just the failed files"
+    )
+
+    REVIEW_LARGE_FILE_LINES: int = Field(
+        default=1000,
+        description="Files or patches longer than this are reviewed per hunk window; 0 reviews every file whole"
+    )
+
+    REVIEW_HUNK_CONTEXT_LINES: int = Field(
+        default=40,
+        description="Lines of surrounding code shown before and after each hunk in large-file reviews"
+    )
+
+    REVIEW_CHECKPOINT_TTL_SECONDS: int = Field(
+        default=24 * 3600,
+        description="How long completed stages of a review task are kept for its retries"
+    )
+
+    # Per-file review cache
+    REVIEW_CACHE_BACKEND: str = Field(
+        default="redis",
+        description="Backend for cached per-file reviews: memory, redis, disk or none"
+    )
+
+    REVIEW_CACHE_TTL_SECONDS: int = Field(
+        default=7 * 24 * 3600,
+        description="How long a cached per-file review stays valid"
+    )
+
+    REVIEW_CACHE_MAX_ENTRIES: int = Field(
+        default=10000,
+        description="Maximum entries in the in-process review cache"
+    )
+
+    REVIEW_CACHE_DIR: str = Field(
+        default="/var/lib/code-review-agent/cache",
+        description="Directory for the disk review cache"
+    )
+
+    REVIEW_CACHE_MAX_BYTES: int = Field(
+        default=1024 ** 3,
+        description="Maximum size of the disk review cache"
+    )
+
     CELERY_BROKER_URL: str = Field(
         default="redis://redis:6379/0",
         description="Celery broker url"
@@ -62,15 +124,238 @@ class Settings(BaseSettings):
         description="CELERY RESULT BACKEND"
     ) 
 
+    CELERY_WORKER_PREFETCH_MULTIPLIER: int = Field(
+        default=1,
+        description="Tasks each worker process reserves ahead; overridden per queue with --prefetch-multiplier"
+    )
+
+    ROUTING_LARGE_COST_THRESHOLD: float = Field(
+        default=40.0,
+        description="Estimated review cost at or above which a PR goes to the large-review queue"
+    )
+
+    QUEUE_LATENCY_SAMPLES: int = Field(
+        default=1000,
+        description="Most recent task latency samples kept per queue for /metrics/queues"
+    )
+
+    WORKER_METRICS_PORT: int = Field(
+        default=9100,
+        description="Port of the Celery worker's Prometheus exporter; 0 disables it"
+    )
+
+    REVIEW_RECORD_TIMINGS: bool = Field(
+        default=False,
+        description="Store a per-stage timing and token breakdown under 'timings' in each review result"
+    )
+
+    CELERY_RESULT_EXPIRES_SECONDS: int = Field(
+        default=24 * 3600,
+        description="How long Celery keeps task states (and the result references tasks return)"
+    )
+
+    RESULT_CACHE_TTL_SECONDS: int = Field(
+        default=900,
+        description="How long a finished review stays in the Redis result cache before /results reads Postgres"
+    )
+
+    RESULT_CACHE_MAX_BYTES: int = Field(
+        default=256 * 1024,
+        description="Compressed size above which a result is served from Postgres only"
+    )
+
     REDIS_CLIENT_URL: str = Field(
         default="redis://redis:6379/0",
         description="Redis client url"
     )
 
+    REDIS_ASYNC_MAX_CONNECTIONS: int = Field(
+        default=200,
+        description="Connections per async Redis pool in the API process; requests beyond it wait for a free one"
+    )
+
+    REDIS_ASYNC_POOL_TIMEOUT_SECONDS: float = Field(
+        default=5.0,
+        description="How long an API request waits for a free async Redis connection before failing"
+    )
+
+    SUBMISSION_TTL_SECONDS: int = Field(
+        default=24 * 3600,
+        description="How long identical /analyze-pr submissions map to the same task"
+    )
+
+    REVIEW_EVENTS_TTL_SECONDS: int = Field(
+        default=3600,
+        description="How long per-task review event streams are kept in Redis"
+    )
+
+    REVIEW_EVENTS_MAXLEN: int = Field(
+        default=10000,
+        description="Approximate maximum number of events kept per task stream"
+    )
+
+    # GitHub API conditional-request cache
+    GITHUB_HTTP_CACHE_BACKEND: str = Field(
+        default="disk",
+        description="Backend storing GitHub API responses with their ETags: memory, redis, disk or none"
+    )
+
+    GITHUB_HTTP_CACHE_TTL_SECONDS: int = Field(
+        default=7 * 24 * 3600,
+        description="How long a stored GitHub API response can be revalidated"
+    )
+
+    GITHUB_HTTP_CACHE_DIR: str = Field(
+        default="/var/lib/code-review-agent/cache",
+        description="Directory for the disk GitHub API cache"
+    )
+
+    GITHUB_HTTP_CACHE_MAX_BYTES: int = Field(
+        default=512 * 1024 ** 2,
+        description="Maximum size of the disk GitHub API cache"
+    )
+
+    # PR file contents
+    GITHUB_FETCH_CONCURRENCY: int = Field(
+        default=8,
+        description="PR file contents fetched from GitHub in parallel"
+    )
+
+    GITHUB_FETCH_BLOBS_BY_SHA: bool = Field(
+        default=True,
+        description="Fetch PR file contents as git blobs by SHA (cacheable forever) instead of by path"
+    )
+
+    GITHUB_FETCH_MAX_RETRIES: int = Field(
+        default=3,
+        description="Retries for GitHub content fetches rejected by rate limits"
+    )
+
+    GITHUB_FETCH_RETRY_BASE_DELAY_SECONDS: float = Field(
+        default=2.0,
+        description="Initial backoff before retrying a rate-limited GitHub content fetch (Retry-After wins when sent)"
+    )
+
+    GITHUB_BLOB_CACHE_BACKEND: str = Field(
+        default="disk",
+        description="Backend caching fetched blobs by SHA: memory, redis, disk or none"
+    )
+
+    GITHUB_BLOB_CACHE_MAX_BYTES: int = Field(
+        default=1024 ** 3,
+        description="Maximum size of the disk blob cache"
+    )
+
+    GITHUB_BLOB_CACHE_MAX_ENTRY_BYTES: int = Field(
+        default=256 * 1024,
+        description="Blobs larger than this are fetched every time instead of cached"
+    )
+
+    GITHUB_BLOB_CACHE_TTL_SECONDS: int = Field(
+        default=7 * 24 * 3600,
+        description="How long cached blobs are kept; blobs never change, this only bounds storage"
+    )
+
+    ANALYSIS_COMPRESS_RESULTS: bool = Field(
+        default=False,
+        description="Store analysis results as zlib-compressed JSON instead of JSONB"
+    )
+
+    # Repository source
+    REPO_SOURCE: str = Field(
+        default="api",
+        description="Where repository trees and contents are read from: api or mirror"
+    )
+
+    REPO_MIRROR_DIR: str = Field(
+        default="/var/lib/code-review-agent/mirrors",
+        description="Directory for local bare git mirrors when REPO_SOURCE=mirror"
+    )
+
+    REPO_MIRROR_FETCH_INTERVAL_SECONDS: int = Field(
+        default=30,
+        description="Minimum time between fetches of the same mirror"
+    )
+
+    # File filtering (applied before any content is fetched)
+    FILE_INCLUDE_PATTERNS: str = Field(
+        default="",
+        description="Comma-separated globs; when set, only matching files are fetched"
+    )
+
+    FILE_EXCLUDE_PATTERNS: str = Field(
+        default="",
+        description="Comma-separated globs of files never fetched"
+    )
+
+    FILE_MAX_BYTES: int = Field(
+        default=1024 * 1024,
+        description="Files larger than this are not fetched or embedded"
+    )
+
+    FILE_SKIP_DETECTED: bool = Field(
+        default=True,
+        description="Skip binary, generated (lockfiles, minified bundles) and vendored files"
+    )
+
+    # Repository index
+    REPO_INDEX_DIR: Optional[str] = Field(
+        default="/var/lib/code-review-agent/index",
+        description="Directory for persisted repository embedding indexes (empty to disable)"
+    )
+
+    REPO_INDEX_MAX_AGE_SECONDS: int = Field(
+        default=7 * 24 * 3600,
+        description="Evict repository indexes unused for longer than this"
+    )
+
+    REPO_INDEX_MAX_BYTES: int = Field(
+        default=5 * 1024 ** 3,
+        description="Maximum total size of persisted repository indexes"
+    )
+
+    REPO_INDEX_MAX_OPEN: int = Field(
+        default=8,
+        description="Repository indexes kept open per worker process (least recently used are closed)"
+    )
+
+    # Ingestion pipeline
+    INDEX_BATCH_CHUNKS: int = Field(
+        default=1000,
+        description="Chunks handed to the vector store per write while indexing"
+    )
+
+    INDEX_QUEUE_SIZE: int = Field(
+        default=32,
+        description="Fetched files buffered ahead of splitting and embedding"
+    )
+
+    # Embedding
+    EMBEDDING_BATCH_SIZE: int = Field(
+        default=100,
+        description="Chunks sent to the embedding provider per request"
+    )
+
+    EMBEDDING_CONCURRENCY: int = Field(
+        default=4,
+        description="Maximum embedding requests in flight per indexing run"
+    )
+
+    EMBEDDING_CACHE_PATH: Optional[str] = Field(
+        default="/var/lib/code-review-agent/index/embeddings.sqlite3",
+        description="SQLite file caching chunk embeddings by content hash (empty to disable)"
+    )
+
+    EMBEDDING_CACHE_MAX_ROWS: int = Field(
+        default=1_000_000,
+        description="Maximum number of cached chunk embeddings"
+    )
+
     class Config:
         env_file = ".env"
         case_sensitive = True
 
+@lru_cache
 def get_settings() -> Settings:
     """
     Create cached instance of settings.
@@ -1 +1 @@
-from .crud import save_analysis, get_analysis_by_repo_pr, get_analysis_by_id
\ No newline at end of file
+from .crud import save_analysis, get_analysis_by_repo_pr, get_analysis_by_id, get_analysis_by_id_async, get_file_reviews, save_file_review, list_analyses_async
\ No newline at end of file
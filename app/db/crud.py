@@ -1,25 +1,110 @@
-from app.db.database import SessionLocal
-from app.db.models import AnalysisResult
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from app.db.database import AsyncSessionLocal, SessionLocal
+from app.db.models import AnalysisResult, FileReview
+import base64
+import json
+import zlib
 
-def get_analysis_by_repo_pr(repo_url: str, pr_number: int):
-    """Fetch analysis entry by repo_url and pr_number."""
+def get_analysis_by_repo_pr(repo_url: str, pr_number: int, head_sha: Optional[str] = None):
+    """Fetch the latest analysis entry for repo_url and pr_number (optionally at one head SHA)."""
     with SessionLocal() as session:
         query = session.query(AnalysisResult).filter(
             AnalysisResult.repo_url == repo_url,
             AnalysisResult.pr_number == pr_number
         )
-        return query.first()
+        if head_sha is not None:
+            query = query.filter(AnalysisResult.head_sha == head_sha)
+        return query.order_by(AnalysisResult.created_at.desc(), AnalysisResult.task_id.desc()).first()
+
+def save_analysis(task_id: str, repo_url: str, pr_number: int, result: dict, head_sha: Optional[str] = None, compress: bool = False) -> bool:
+    """
+    Save analysis entry to the database, optionally as zlib-compressed JSON.
 
-def save_analysis(task_id: str, repo_url: str, pr_number: int, result: dict):
-    """Save analysis entry to the database."""
+    Idempotent per task_id: a retry of a task whose result is already stored
+    leaves the row as it is. Returns whether a row was inserted.
+    """
+    values = {"task_id": task_id, "repo_url": repo_url, "pr_number": pr_number, "head_sha": head_sha}
+    if compress:
+        values["result_compressed"] = zlib.compress(json.dumps(result).encode("utf-8"))
+    else:
+        values["result"] = result
+    statement = insert(AnalysisResult).values(**values).on_conflict_do_nothing(index_elements=["task_id"])
     with SessionLocal() as session:
-        analysis = AnalysisResult(task_id=task_id, repo_url=repo_url, pr_number=pr_number, result=result)
-        session.add(analysis)
+        inserted = session.execute(statement).rowcount
         session.commit()
-        return analysis
+        return inserted > 0
+
+def encode_cursor(analysis: AnalysisResult) -> str:
+    raw = f"{analysis.created_at.isoformat()}|{analysis.task_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    created_at, task_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+    return datetime.fromisoformat(created_at), task_id
+
+async def list_analyses_async(
+    repo_url: str,
+    pr_number: Optional[int] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Tuple[List[AnalysisResult], Optional[str]]:
+    """
+    Analyses of a repository (or one PR), newest first, one page at a time.
+
+    Keyset pagination: `cursor` is the (created_at, task_id) of the last row of
+    the previous page, so every page is an index range scan regardless of depth.
+    Returns the page and the cursor for the next one (None on the last page).
+    """
+    query = select(AnalysisResult).where(AnalysisResult.repo_url == repo_url)
+    if pr_number is not None:
+        query = query.where(AnalysisResult.pr_number == pr_number)
+    if cursor is not None:
+        created_at, task_id = decode_cursor(cursor)
+        query = query.where(tuple_(AnalysisResult.created_at, AnalysisResult.task_id) < (created_at, task_id))
+    query = query.order_by(AnalysisResult.created_at.desc(), AnalysisResult.task_id.desc()).limit(limit + 1)
+
+    async with AsyncSessionLocal() as session:
+        rows = list((await session.execute(query)).scalars())
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
 
 def get_analysis_by_id(task_id: str):
     """Fetch analysis entry by task_id."""
     with SessionLocal() as session:
         query = session.query(AnalysisResult).filter(AnalysisResult.task_id == task_id)
         return query.first()
+
+async def get_analysis_by_id_async(task_id: str):
+    """Fetch analysis entry by task_id without blocking the event loop."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(AnalysisResult).where(AnalysisResult.task_id == task_id))
+        return result.scalars().first()
+
+def get_file_reviews(repo_url: str, pr_number: int) -> Dict[str, List[dict]]:
+    """Fetch stored per-file review issues for a PR, keyed by patch hash."""
+    with SessionLocal() as session:
+        rows = session.query(FileReview.patch_hash, FileReview.issues).filter(
+            FileReview.repo_url == repo_url,
+            FileReview.pr_number == pr_number
+        )
+        return {patch_hash: issues for patch_hash, issues in rows}
+
+def save_file_review(repo_url: str, pr_number: int, head_sha: str, filename: str, patch_hash: str, issues: List[dict]):
+    """Save (or replace) the review issues of one file patch."""
+    statement = insert(FileReview).values(
+        repo_url=repo_url,
+        pr_number=pr_number,
+        filename=filename,
+        patch_hash=patch_hash,
+        head_sha=head_sha,
+        issues=issues
+    ).on_conflict_do_update(
+        constraint="uq_file_reviews_patch",
+        set_={"head_sha": head_sha, "issues": issues}
+    )
+    with SessionLocal() as session:
+        session.execute(statement)
+        session.commit()
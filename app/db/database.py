@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import get_settings
 
@@ -12,9 +14,38 @@ engine = create_engine(str(DATABASE_URL), echo=False, pool_pre_ping=True)
 # Create synchronous sessionmaker
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+# Async engine for the API's read path, same database through asyncpg
+ASYNC_DATABASE_URL = make_url(str(DATABASE_URL)).set(drivername="postgresql+asyncpg")
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, pool_pre_ping=True)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
 # Base class for models
 Base = declarative_base()
 
+# Columns added to tables that predate them; create_all() only creates missing tables.
+ANALYSIS_RESULTS_MIGRATIONS = (
+    "ALTER TABLE analysis_results ADD COLUMN IF NOT EXISTS head_sha VARCHAR",
+    "ALTER TABLE analysis_results ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now()",
+    "ALTER TABLE analysis_results ADD COLUMN IF NOT EXISTS result_compressed BYTEA",
+    "ALTER TABLE analysis_results ALTER COLUMN result DROP NOT NULL",
+)
+
 def init_db():
+    from app.db.models import AnalysisResult
+
     with engine.begin() as conn:
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=conn)
+        if conn.dialect.name != "postgresql":
+            return
+        for statement in ANALYSIS_RESULTS_MIGRATIONS:
+            conn.execute(text(statement))
+        result_type = conn.execute(text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_name = 'analysis_results' AND column_name = 'result'"
+        )).scalar()
+        if result_type == "json":
+            conn.execute(text("ALTER TABLE analysis_results ALTER COLUMN result TYPE JSONB USING result::jsonb"))
+        for index in AnalysisResult.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
@@ -1,11 +1,46 @@
-from sqlalchemy import Column, String, JSON, UniqueConstraint, Integer
+from sqlalchemy import Column, String, JSON, UniqueConstraint, Integer, DateTime, LargeBinary, Index, func
+from sqlalchemy.dialects.postgresql import JSONB
+import json
+import zlib
 from app.db.database import Base
 
 class AnalysisResult(Base):
 
     __tablename__= "analysis_results"
+    __table_args__ = (
+        Index("ix_analysis_results_repo_pr_sha_created", "repo_url", "pr_number", "head_sha", "created_at"),
+        # Keyset pagination and "latest for this PR / repo" walk these in (created_at, task_id) order.
+        Index("ix_analysis_results_repo_pr_created", "repo_url", "pr_number", "created_at", "task_id"),
+        Index("ix_analysis_results_repo_created", "repo_url", "created_at", "task_id"),
+    )
 
     task_id = Column(String, primary_key=True, index=True)
     repo_url = Column(String, nullable=False)
     pr_number = Column(Integer, nullable=False)
-    result = Column(JSON, nullable=False)
\ No newline at end of file
+    head_sha = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Exactly one of result / result_compressed (zlib-compressed JSON) is set.
+    result = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    result_compressed = Column(LargeBinary, nullable=True)
+
+    @property
+    def payload(self) -> dict:
+        if self.result_compressed is not None:
+            return json.loads(zlib.decompress(self.result_compressed))
+        return self.result
+
+
+class FileReview(Base):
+
+    __tablename__ = "file_reviews"
+    __table_args__ = (
+        UniqueConstraint("repo_url", "pr_number", "filename", "patch_hash", name="uq_file_reviews_patch"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    repo_url = Column(String, nullable=False)
+    pr_number = Column(Integer, nullable=False)
+    filename = Column(String, nullable=False)
+    patch_hash = Column(String, nullable=False)
+    head_sha = Column(String, nullable=False)
+    issues = Column(JSON, nullable=False)
@@ -1,12 +1,21 @@
 from fastapi import FastAPI
 from app.api.endpoints import router
-from app.db.database import init_db
+from app.db.database import init_db, async_engine
+from app.config import init_dependencies, close_dependencies, close_async_dependencies
 
 app = FastAPI()
 
 @app.on_event("startup")
 def startup_event():
     init_db()
+    init_dependencies()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_async_dependencies()
+    await async_engine.dispose()
+    close_dependencies()
 
 app.include_router(router)
 
@@ -1 +1 @@
-from .request_models import AnalyzePRRequest
\ No newline at end of file
+from .request_models import AnalyzePRRequest, AnalyzeBatchRequest
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from typing import List, Optional
 
 
 class AnalyzePRRequest(BaseModel):
@@ -8,3 +8,10 @@ class AnalyzePRRequest(BaseModel):
     github_token: Optional[str] = None
 
 
+class AnalyzeBatchRequest(BaseModel):
+    repo_url: HttpUrl
+    # Either an explicit list of PRs or every open PR of the repository.
+    pr_numbers: Optional[List[int]] = None
+    all_open: bool = False
+
+
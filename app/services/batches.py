@@ -0,0 +1,43 @@
+import json
+from typing import Dict, List, Optional
+from redis import Redis
+from redis import asyncio as aioredis
+
+
+BATCH_KEY_PREFIX = "review-batch"
+
+# Task states after which a per-PR review will not change any more.
+FINISHED_STATUSES = ("SUCCESS", "FAILURE", "REVOKED")
+
+
+def batch_key(batch_id: str) -> str:
+    return f"{BATCH_KEY_PREFIX}:{batch_id}"
+
+
+def save_batch(cache_client: Redis, batch_id: str, repo_url: str, tasks: List[Dict], ttl_seconds: int) -> None:
+    """Record which review task handles each PR of a batch; `tasks` items are {"pr_number", "task_id", "deduplicated"}."""
+    cache_client.set(batch_key(batch_id), json.dumps({"repo_url": repo_url, "tasks": tasks}), ex=ttl_seconds)
+
+
+async def load_batch(redis_client: aioredis.Redis, batch_id: str) -> Optional[Dict]:
+    raw = await redis_client.get(batch_key(batch_id))
+    return json.loads(raw) if raw else None
+
+
+def summarize_batch(tasks: List[Dict], statuses: Dict[str, str]) -> Dict:
+    """Aggregate progress of a batch from the per-task statuses."""
+    counts: Dict[str, int] = {}
+    for task in tasks:
+        status = statuses.get(task["task_id"], "PENDING")
+        task["status"] = status
+        counts[status] = counts.get(status, 0) + 1
+    finished = sum(counts.get(status, 0) for status in FINISHED_STATUSES)
+    return {
+        "total": len(tasks),
+        "finished": finished,
+        "succeeded": counts.get("SUCCESS", 0),
+        "failed": counts.get("FAILURE", 0) + counts.get("REVOKED", 0),
+        "counts": counts,
+        "done": finished == len(tasks),
+        "tasks": tasks,
+    }
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from redis import Redis
+
+
+class CacheBackend(ABC):
+    """Minimal bytes key/value store with optional per-entry TTL."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl_seconds: Optional[int] = None) -> None:
+        ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU bounded by entry count."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Optional[float], bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl_seconds: Optional[int] = None) -> None:
+        expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared across workers. Entries only leave on their TTL, so total size is
+    unbounded unless the Redis server sets maxmemory with an eviction policy;
+    prefer the disk backend for anything large.
+    """
+
+    def __init__(self, client: Redis, namespace: str):
+        self.client = client
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self._key(key))
+
+    def set(self, key: str, value: bytes, ttl_seconds: Optional[int] = None) -> None:
+        self.client.set(self._key(key), value, ex=ttl_seconds or None)
+
+
+class DiskCacheBackend(CacheBackend):
+    """One file per entry, evicted oldest-first once the directory exceeds max_bytes."""
+
+    EVICTION_CHECK_INTERVAL = 100
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                header = cache_file.readline()
+                value = cache_file.read()
+        except OSError:
+            return None
+        expires_at = float(header) if header.strip() else None
+        if expires_at is not None and expires_at < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key: str, value: bytes, ttl_seconds: Optional[int] = None) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = f"{time.time() + ttl_seconds}" if ttl_seconds else ""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as cache_file:
+            cache_file.write(header.encode("ascii") + b"\n" + value)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % self.EVICTION_CHECK_INTERVAL == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def build_cache_backend(
+    kind: str,
+    namespace: str,
+    max_entries: int = 10000,
+    directory: Optional[str] = None,
+    max_bytes: int = 1024 ** 3,
+    redis_client: Optional[Redis] = None,
+) -> Optional[CacheBackend]:
+    if kind == "none":
+        return None
+    if kind == "memory":
+        return MemoryCacheBackend(max_entries=max_entries)
+    if kind == "redis":
+        if redis_client is None:
+            raise RuntimeError("Redis cache backend requires a redis client")
+        return RedisCacheBackend(client=redis_client, namespace=namespace)
+    if kind == "disk":
+        if not directory:
+            raise RuntimeError("Disk cache backend requires a directory")
+        return DiskCacheBackend(directory=os.path.join(directory, namespace), max_bytes=max_bytes)
+    raise RuntimeError(f"Unsupported cache backend: {kind}")
+
+
+class ReviewCache:
+    """
+    Per-file review results keyed by a hash of (model, generation params, rendered prompt).
+
+    Identical prompts produce identical keys, so files whose patch, content and
+    retrieved context did not change between pushes skip the LLM entirely.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, params: Dict[str, Any], prompt: str) -> str:
+        material = json.dumps({"model": model, "params": params, "prompt": prompt}, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        try:
+            cached = self.backend.get(key)
+        except Exception as e:
+            print(f"Review cache read failed: {e}")
+            cached = None
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(cached) if cached is not None else None
+
+    def set(self, key: str, issues: List[Dict]) -> None:
+        try:
+            self.backend.set(key, json.dumps(issues).encode("utf-8"), ttl_seconds=self.ttl_seconds)
+        except Exception as e:
+            print(f"Review cache write failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,108 @@
+import json
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Set
+from redis import Redis
+from app.services.github_integration import PRDetails, PRFile
+
+
+CHECKPOINT_KEY_PREFIX = "review-checkpoint"
+
+FETCH_STAGE = "fetch"
+INDEX_STAGE = "index"
+AGGREGATE_STAGE = "aggregate"
+FILE_STAGE_PREFIX = "file:"
+REPORTED_STAGE_PREFIX = "reported:"
+
+
+def checkpoint_key(task_id: str) -> str:
+    return f"{CHECKPOINT_KEY_PREFIX}:{task_id}"
+
+
+class ReviewCheckpoint:
+    """
+    Outputs of the completed stages of one review task, kept in a Redis hash
+    keyed by the task id so a retry of the same task resumes after them.
+
+    Stages are `fetch` (the PR details), `index` (the commit the repository
+    index was built for), one `file:<patch hash>` entry per reviewed file,
+    one `reported:<filename>` entry per file already published to the task's
+    event stream, and `aggregate` (the task result). Redis failures are logged and treated as a
+    missing checkpoint, so they cost a recomputation rather than the review.
+    """
+
+    def __init__(self, cache_client: Redis, task_id: str, ttl_seconds: int):
+        self.cache_client = cache_client
+        self.key = checkpoint_key(task_id)
+        self.ttl_seconds = ttl_seconds
+
+    def _get(self, stage: str) -> Optional[Any]:
+        try:
+            raw = self.cache_client.hget(self.key, stage)
+        except Exception as e:
+            print(f"Error reading {stage} checkpoint {self.key}: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def _set(self, stage: str, value: Any) -> None:
+        try:
+            pipeline = self.cache_client.pipeline(transaction=False)
+            pipeline.hset(self.key, stage, json.dumps(value))
+            pipeline.expire(self.key, self.ttl_seconds)
+            pipeline.execute()
+        except Exception as e:
+            print(f"Error writing {stage} checkpoint {self.key}: {e}")
+
+    def load_pr_details(self) -> Optional[PRDetails]:
+        data = self._get(FETCH_STAGE)
+        if data is None:
+            return None
+        return PRDetails(**{**data, "files": [PRFile(**file) for file in data["files"]]})
+
+    def save_pr_details(self, pr_details: PRDetails) -> None:
+        self._set(FETCH_STAGE, asdict(pr_details))
+
+    def load_index_commit(self) -> Optional[str]:
+        return self._get(INDEX_STAGE)
+
+    def save_index_commit(self, commit_sha: Optional[str]) -> None:
+        if commit_sha is not None:
+            self._set(INDEX_STAGE, commit_sha)
+
+    def _load_prefixed(self, prefix: str) -> Dict[str, Any]:
+        try:
+            entries = self.cache_client.hgetall(self.key)
+        except Exception as e:
+            print(f"Error reading {prefix} checkpoints {self.key}: {e}")
+            return {}
+        values = {}
+        for stage, raw in entries.items():
+            stage = stage.decode("utf-8") if isinstance(stage, bytes) else stage
+            if stage.startswith(prefix):
+                values[stage[len(prefix):]] = json.loads(raw)
+        return values
+
+    def load_file_reviews(self) -> Dict[str, List[Dict]]:
+        """Issues of the files reviewed so far, keyed by file_patch_hash()."""
+        return self._load_prefixed(FILE_STAGE_PREFIX)
+
+    def save_file_review(self, patch_hash: str, issues: List[Dict]) -> None:
+        self._set(f"{FILE_STAGE_PREFIX}{patch_hash}", issues)
+
+    def load_reported_files(self) -> Set[str]:
+        """Files whose progress event an earlier attempt already published."""
+        return set(self._load_prefixed(REPORTED_STAGE_PREFIX))
+
+    def save_reported_file(self, filename: str) -> None:
+        self._set(f"{REPORTED_STAGE_PREFIX}{filename}", True)
+
+    def load_result(self) -> Optional[Dict]:
+        return self._get(AGGREGATE_STAGE)
+
+    def save_result(self, result: Dict) -> None:
+        self._set(AGGREGATE_STAGE, result)
+
+    def clear(self) -> None:
+        try:
+            self.cache_client.delete(self.key)
+        except Exception as e:
+            print(f"Error clearing checkpoint {self.key}: {e}")
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.metrics import EMBEDDING_CHUNKS, timed
+from app.services.retry import with_backoff
+
+
+@dataclass
+class EmbeddingStats:
+    chunks: int = 0
+    unique_chunks: int = 0
+    cached_chunks: int = 0
+    embedded_chunks: int = 0
+    batches: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def since(self, earlier: "EmbeddingStats") -> Dict:
+        delta = {key: value - getattr(earlier, key) for key, value in asdict(self).items()}
+        delta["seconds"] = round(delta["seconds"], 3)
+        return delta
+
+
+class EmbeddingStore:
+    """
+    Embedding vectors keyed by chunk hash, shared by every worker on the host.
+
+    Oldest rows are dropped once the store holds more than `max_rows` vectors.
+    """
+
+    EVICTION_CHECK_INTERVAL = 1000
+
+    def __init__(self, path: str, max_rows: int):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_rows = max_rows
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._connection.commit()
+
+    def get_many(self, hashes: List[str]) -> Dict[str, List[float]]:
+        vectors = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE hash IN ({placeholders})", batch
+                )
+                for chunk_hash, blob in rows:
+                    vectors[chunk_hash] = array("f", blob).tolist()
+        return vectors
+
+    def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO embeddings (hash, vector) VALUES (?, ?)",
+                [(chunk_hash, array("f", vector).tobytes()) for chunk_hash, vector in vectors.items()],
+            )
+            self._writes += len(vectors)
+            if self._writes >= self.EVICTION_CHECK_INTERVAL:
+                self._writes = 0
+                self._connection.execute(
+                    "DELETE FROM embeddings WHERE rowid IN ("
+                    "SELECT rowid FROM embeddings ORDER BY rowid LIMIT "
+                    "max(0, (SELECT count(*) FROM embeddings) - ?))",
+                    (self.max_rows,),
+                )
+            self._connection.commit()
+
+
+class DedupEmbeddings(Embeddings):
+    """
+    Wraps an embedding model so each distinct chunk is embedded once.
+
+    Chunks are hashed (together with the model name); duplicates within a call
+    and chunks already in the store are served without a provider call. The
+    rest are sent in batches of `batch_size`, at most `concurrency` at a time,
+    with backoff when the provider reports a rate limit.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        store: Optional[EmbeddingStore] = None,
+        batch_size: int = 100,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        retry_base_delay: float = 2.0,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.store = store
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.stats = EmbeddingStats()
+        self._stats_lock = threading.Lock()
+
+    def _hash(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return with_backoff(lambda: self.embeddings.embed_documents(texts), self.max_retries, self.retry_base_delay)
+
+    def _batches(self, items: List[str]) -> Iterable[List[str]]:
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        hashes = [self._hash(text) for text in texts]
+        unique = dict(zip(hashes, texts))
+
+        vectors = {}
+        if self.store is not None:
+            try:
+                vectors = self.store.get_many(list(unique))
+            except Exception as e:
+                print(f"Embedding store read failed: {e}")
+        cached = len(vectors)
+        missing = [chunk_hash for chunk_hash in unique if chunk_hash not in vectors]
+        batches = list(self._batches(missing))
+
+        def embed(batch: List[str]) -> Dict[str, List[float]]:
+            return dict(zip(batch, self._embed_batch([unique[chunk_hash] for chunk_hash in batch])))
+
+        new_vectors = {}
+        with timed("index.embed"):
+            if len(batches) > 1 and self.concurrency > 1:
+                with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+                    for result in executor.map(embed, batches):
+                        new_vectors.update(result)
+            else:
+                for batch in batches:
+                    new_vectors.update(embed(batch))
+
+        if new_vectors and self.store is not None:
+            try:
+                self.store.put_many(new_vectors)
+            except Exception as e:
+                print(f"Embedding store write failed: {e}")
+        vectors.update(new_vectors)
+
+        with self._stats_lock:
+            self.stats.chunks += len(texts)
+            self.stats.unique_chunks += len(unique)
+            self.stats.cached_chunks += cached
+            self.stats.embedded_chunks += len(missing)
+            self.stats.batches += len(batches)
+            self.stats.bytes += sum(len(unique[chunk_hash].encode("utf-8")) for chunk_hash in missing)
+            self.stats.seconds += time.perf_counter() - started
+        EMBEDDING_CHUNKS.labels("cached").inc(cached)
+        EMBEDDING_CHUNKS.labels("embedded").inc(len(missing))
+
+        return [vectors[chunk_hash] for chunk_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def snapshot(self) -> EmbeddingStats:
+        with self._stats_lock:
+            return EmbeddingStats(**asdict(self.stats))
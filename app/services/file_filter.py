@@ -0,0 +1,85 @@
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Optional, Sequence, Tuple
+
+
+BINARY_EXTENSIONS = (
+    "png", "jpg", "jpeg", "gif", "bmp", "ico", "icns", "webp", "tif", "tiff", "psd",
+    "pdf", "doc", "docx", "xls", "xlsx", "ppt", "pptx",
+    "zip", "gz", "tgz", "bz2", "xz", "7z", "rar", "jar", "war", "whl", "egg",
+    "exe", "dll", "so", "dylib", "a", "o", "obj", "lib", "bin", "class", "pyc", "pyo", "wasm",
+    "ttf", "otf", "woff", "woff2", "eot",
+    "mp3", "mp4", "m4a", "wav", "ogg", "flac", "avi", "mov", "mkv", "webm",
+    "sqlite", "sqlite3", "db", "pkl", "pickle", "npy", "npz", "parquet", "h5", "onnx", "pt",
+)
+
+GENERATED_PATTERNS = (
+    "*.min.js", "*.min.css", "*.map", "*.bundle.js", "*.chunk.js",
+    "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "*.generated.*", "*.g.dart",
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "Pipfile.lock",
+    "Cargo.lock", "composer.lock", "Gemfile.lock", "go.sum", "uv.lock",
+)
+
+VENDORED_DIRECTORIES = (
+    "node_modules", "vendor", "third_party", "thirdparty", "bower_components",
+    "dist", "build", ".venv", "venv", "site-packages", "__pycache__",
+    ".git", ".idea", ".vscode",
+)
+
+
+@dataclass(frozen=True)
+class FileFilter:
+    """
+    Path and size rules deciding which repository files are worth fetching.
+
+    Evaluated against tree listings and PR file lists before any content is
+    downloaded. Include patterns, when given, must match; exclude patterns,
+    binary extensions, generated-file patterns and vendored directories
+    reject. Patterns are matched against the full path and the base name.
+    """
+
+    include: Tuple[str, ...] = ()
+    exclude: Tuple[str, ...] = ()
+    max_file_bytes: Optional[int] = 1024 * 1024
+    binary_extensions: Tuple[str, ...] = BINARY_EXTENSIONS
+    generated_patterns: Tuple[str, ...] = GENERATED_PATTERNS
+    vendored_directories: Tuple[str, ...] = VENDORED_DIRECTORIES
+    _binary_extensions: frozenset = field(init=False, repr=False, compare=False)
+    _vendored_directories: frozenset = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_binary_extensions", frozenset(ext.lower() for ext in self.binary_extensions))
+        object.__setattr__(self, "_vendored_directories", frozenset(self.vendored_directories))
+
+    @staticmethod
+    def _matches(path: str, patterns: Sequence[str]) -> bool:
+        name = path.rsplit("/", 1)[-1]
+        return any(fnmatchcase(path, pattern) or fnmatchcase(name, pattern) for pattern in patterns)
+
+    def skip_reason(self, path: str, size: Optional[int] = None) -> Optional[str]:
+        """Why `path` should not be fetched, or None when it should."""
+        if self.include and not self._matches(path, self.include):
+            return "not included"
+        if self._matches(path, self.exclude):
+            return "excluded"
+        directories = path.split("/")[:-1]
+        if any(directory in self._vendored_directories for directory in directories):
+            return "vendored"
+        name = path.rsplit("/", 1)[-1]
+        if "." in name and name.rsplit(".", 1)[-1].lower() in self._binary_extensions:
+            return "binary"
+        if self._matches(path, self.generated_patterns):
+            return "generated"
+        if size is not None and self.max_file_bytes is not None and size > self.max_file_bytes:
+            return "too large"
+        return None
+
+    def allows(self, path: str, size: Optional[int] = None) -> bool:
+        return self.skip_reason(path, size) is None
+
+
+def split_patterns(value: Optional[str]) -> Tuple[str, ...]:
+    """Comma-separated glob patterns from a setting."""
+    if not value:
+        return ()
+    return tuple(pattern.strip() for pattern in value.split(",") if pattern.strip())
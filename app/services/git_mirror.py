@@ -0,0 +1,283 @@
+import base64
+import fcntl
+import hashlib
+import os
+import subprocess
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from app.services.file_filter import FileFilter
+from app.services.github_integration import ChangedFile, PRFile, RepoTree, TreeEntry, pr_file_content
+
+
+SYNC_MARKER = "last-sync"
+
+NAME_STATUS = {
+    "A": "added",
+    "C": "added",
+    "D": "removed",
+    "M": "modified",
+    "R": "renamed",
+    "T": "modified",
+}
+
+
+class GitMirrorSource:
+    """
+    Repository source backed by a local bare mirror per repository.
+
+    Mirrors are created with `git clone --mirror` (which also carries
+    refs/pull/*) and refreshed with one incremental fetch at most every
+    `fetch_interval_seconds`. Trees, blobs and PR diffs are then read straight
+    from the local object store instead of one API call per file.
+    """
+
+    def __init__(self, root_dir: str, github_token: Optional[str] = None, fetch_interval_seconds: int = 30):
+        self.root_dir = root_dir
+        self.github_token = github_token
+        self.fetch_interval_seconds = fetch_interval_seconds
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    @staticmethod
+    def _remote_url(repo_url: str) -> str:
+        parsed = urlparse(repo_url)
+        if parsed.scheme == "file":
+            return repo_url
+        parts = parsed.path.strip("/").split("/")
+        if len(parts) < 2:
+            raise ValueError("Invalid Github repo url")
+        repo_name = parts[1][:-4] if parts[1].endswith(".git") else parts[1]
+        return f"{parsed.scheme}://{parsed.netloc}/{parts[0]}/{repo_name}.git"
+
+    def _mirror_path(self, repo_url: str) -> str:
+        remote_url = self._remote_url(repo_url)
+        name = urlparse(remote_url).path.rstrip("/").rsplit("/", 1)[-1]
+        digest = hashlib.sha1(remote_url.lower().encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.root_dir, f"{name[:-4] if name.endswith('.git') else name}-{digest}.git")
+
+    def _env(self, repo_url: str) -> Dict[str, str]:
+        env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+        if not self.github_token or urlparse(repo_url).scheme == "file":
+            return env
+        # Passed as environment config rather than `-c`, so the token never shows up in process listings.
+        credentials = base64.b64encode(f"x-access-token:{self.github_token}".encode("utf-8")).decode("ascii")
+        env.update({
+            "GIT_CONFIG_COUNT": "1",
+            "GIT_CONFIG_KEY_0": "http.extraHeader",
+            "GIT_CONFIG_VALUE_0": f"AUTHORIZATION: basic {credentials}",
+        })
+        return env
+
+    def _git(self, repo_url: str, *args: str, check: bool = True) -> subprocess.CompletedProcess:
+        command = ["git", "--git-dir", self._mirror_path(repo_url), *args]
+        return subprocess.run(command, capture_output=True, check=check, env=self._env(repo_url))
+
+    @contextmanager
+    def _locked(self, mirror_path: str) -> Iterator[None]:
+        with open(f"{mirror_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def sync(self, repo_url: str, force: bool = False) -> None:
+        """Clone the mirror on first use, otherwise fetch if the last sync is older than the interval."""
+        mirror_path = self._mirror_path(repo_url)
+        marker = os.path.join(mirror_path, SYNC_MARKER)
+        with self._locked(mirror_path):
+            if not os.path.isdir(mirror_path):
+                subprocess.run(
+                    ["git", "clone", "--mirror", "--quiet", self._remote_url(repo_url), mirror_path],
+                    capture_output=True,
+                    check=True,
+                    env=self._env(repo_url),
+                )
+            elif force or not os.path.exists(marker) or time.time() - os.path.getmtime(marker) > self.fetch_interval_seconds:
+                self._git(repo_url, "fetch", "--prune", "--quiet", "origin")
+            else:
+                return
+            with open(marker, "w"):
+                pass
+
+    def _rev_parse(self, repo_url: str, ref: str) -> Optional[str]:
+        result = self._git(repo_url, "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}", check=False)
+        if result.returncode != 0:
+            return None
+        return result.stdout.decode("utf-8").strip()
+
+    def resolve_commit(self, repo_url: str, ref: Optional[str] = None) -> str:
+        self.sync(repo_url)
+        ref = ref or "HEAD"
+        commit_sha = self._rev_parse(repo_url, ref)
+        if commit_sha is None:
+            # The ref may be newer than the last fetch.
+            self.sync(repo_url, force=True)
+            commit_sha = self._rev_parse(repo_url, ref)
+        if commit_sha is None:
+            raise ValueError(f"Unknown ref {ref} in {repo_url}")
+        return commit_sha
+
+    def get_default_branch(self, repo_url: str) -> str:
+        self.sync(repo_url)
+        return self._git(repo_url, "symbolic-ref", "--short", "HEAD").stdout.decode("utf-8").strip()
+
+    def get_repo_tree(self, repo_url: str, ref: Optional[str] = None) -> RepoTree:
+        commit_sha = self.resolve_commit(repo_url, ref)
+        output = self._git(repo_url, "ls-tree", "-r", "-t", "-l", "-z", commit_sha).stdout
+
+        entries = []
+        for record in output.split(b"\0"):
+            if not record:
+                continue
+            meta, path = record.split(b"\t", 1)
+            _, object_type, sha, size = meta.split()
+            entries.append(TreeEntry(
+                path=path.decode("utf-8", errors="replace"),
+                type=object_type.decode("ascii"),
+                sha=sha.decode("ascii"),
+                size=int(size) if object_type == b"blob" else None,
+            ))
+        return RepoTree(commit_sha=commit_sha, entries=entries)
+
+    def get_file_content(self, repo_url: str, file_path: str, ref: str) -> Optional[str]:
+        for _, content in self.iter_file_contents(repo_url, [file_path], ref):
+            return content
+        return None
+
+    def iter_file_contents(self, repo_url: str, file_paths: Iterable[str], ref: str) -> Iterator[Tuple[str, Optional[str]]]:
+        """Stream (path, text) pairs through one `git cat-file --batch` process."""
+        for file_path, data in self.iter_file_blobs(repo_url, file_paths, ref):
+            try:
+                text = data.decode("utf-8") if data is not None else None
+            except UnicodeDecodeError:
+                text = None
+            yield file_path, text
+
+    def iter_file_blobs(self, repo_url: str, file_paths: Iterable[str], ref: str) -> Iterator[Tuple[str, Optional[bytes]]]:
+        """Stream (path, raw bytes) pairs through one `git cat-file --batch` process."""
+        commit_sha = self.resolve_commit(repo_url, ref)
+        process = subprocess.Popen(
+            ["git", "--git-dir", self._mirror_path(repo_url), "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        try:
+            for file_path in file_paths:
+                process.stdin.write(f"{commit_sha}:{file_path}\n".encode("utf-8"))
+                process.stdin.flush()
+                header = process.stdout.readline().split()
+                if len(header) != 3:
+                    yield file_path, None
+                    continue
+                size = int(header[2])
+                data = process.stdout.read(size)
+                process.stdout.read(1)
+                yield file_path, data if header[1] == b"blob" else None
+        finally:
+            process.stdin.close()
+            process.stdout.close()
+            process.wait()
+
+    def _is_ancestor(self, repo_url: str, base_sha: str, head_sha: str) -> bool:
+        return self._git(repo_url, "merge-base", "--is-ancestor", base_sha, head_sha, check=False).returncode == 0
+
+    def _name_status(self, repo_url: str, base_sha: str, head_sha: str) -> List[ChangedFile]:
+        tokens = self._git(repo_url, "diff", "--name-status", "-z", "-M", base_sha, head_sha).stdout.split(b"\0")
+        changes = []
+        index = 0
+        while index < len(tokens) and tokens[index]:
+            code = tokens[index].decode("ascii")
+            if code[0] in ("R", "C"):
+                previous, filename = tokens[index + 1], tokens[index + 2]
+                index += 3
+            else:
+                previous, filename = None, tokens[index + 1]
+                index += 2
+            changes.append(ChangedFile(
+                filename=filename.decode("utf-8", errors="replace"),
+                status=NAME_STATUS.get(code[0], "modified"),
+                previous_filename=previous.decode("utf-8", errors="replace") if code[0] == "R" else None,
+            ))
+        return changes
+
+    def get_changed_files(self, repo_url: str, base_sha: str, head_sha: str) -> Optional[List[ChangedFile]]:
+        self.resolve_commit(repo_url, head_sha)
+        if self._rev_parse(repo_url, base_sha) is None or not self._is_ancestor(repo_url, base_sha, head_sha):
+            return None
+        return self._name_status(repo_url, base_sha, head_sha)
+
+    def _numstat(self, repo_url: str, base_sha: str, head_sha: str) -> List[Tuple[int, int]]:
+        tokens = self._git(repo_url, "diff", "--numstat", "-z", "-M", base_sha, head_sha).stdout.split(b"\0")
+        stats = []
+        index = 0
+        while index < len(tokens) and tokens[index]:
+            additions, deletions, path = tokens[index].split(b"\t", 2)
+            # Renames leave the path empty and append old and new paths as separate tokens.
+            index += 3 if not path else 1
+            stats.append((
+                int(additions) if additions != b"-" else 0,
+                int(deletions) if deletions != b"-" else 0,
+            ))
+        return stats
+
+    def _patches(self, repo_url: str, base_sha: str, head_sha: str) -> List[Optional[str]]:
+        output = self._git(repo_url, "diff", "-M", base_sha, head_sha).stdout.decode("utf-8", errors="replace")
+        patches = []
+        for section in f"\n{output}".split("\ndiff --git ")[1:]:
+            hunk_start = section.find("\n@@")
+            # Match the GitHub API: only the hunks, without the diff headers.
+            patches.append(section[hunk_start + 1:].rstrip("\n") if hunk_start != -1 else None)
+        return patches
+
+    def get_pr_files(
+        self,
+        repo_url: str,
+        pr_number: int,
+        base_sha: Optional[str] = None,
+        head_sha: Optional[str] = None,
+        file_filter: Optional[FileFilter] = None,
+    ) -> List[PRFile]:
+        """PR files computed locally from the merge base of base and head, like GitHub's three-dot diff."""
+        head_sha = self.resolve_commit(repo_url, head_sha or f"refs/pull/{pr_number}/head")
+        base_sha = self.resolve_commit(repo_url, base_sha)
+        merge_base = self._git(repo_url, "merge-base", base_sha, head_sha).stdout.decode("utf-8").strip()
+
+        changes = self._name_status(repo_url, merge_base, head_sha)
+        stats = self._numstat(repo_url, merge_base, head_sha)
+        patches = self._patches(repo_url, merge_base, head_sha)
+
+        skip_reasons = {
+            change.filename: file_filter.skip_reason(change.filename) if file_filter is not None else None
+            for change in changes
+        }
+        blobs = dict(self.iter_file_blobs(
+            repo_url,
+            [
+                change.filename
+                for change in changes
+                if change.status != "removed" and skip_reasons[change.filename] is None
+            ],
+            head_sha,
+        ))
+
+        files = []
+        for change, (additions, deletions), patch in zip(changes, stats, patches):
+            content, skip_reason, error = None, skip_reasons[change.filename], None
+            data = blobs.get(change.filename)
+            if data is not None:
+                content, skip_reason, error = pr_file_content(file_filter, change.filename, data)
+            files.append(PRFile(
+                filename=change.filename,
+                status=change.status,
+                additions=additions,
+                deletions=deletions,
+                changes=additions + deletions,
+                patch=patch,
+                content=content,
+                skip_reason=skip_reason,
+                error=error,
+            ))
+        return files
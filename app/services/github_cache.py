@@ -0,0 +1,178 @@
+import hashlib
+import json
+import re
+import threading
+from typing import Any, Dict, ItemsView, Iterator, Optional, Type
+
+from github import Github
+from github.Requester import HTTPSRequestsConnectionClass, HTTPRequestsConnectionClass, Requester, RequestsResponse
+
+from app.services.cache import CacheBackend
+from app.services.metrics import record_github_response
+
+
+# Larger bodies (big diffs, blobs) are passed through without being stored.
+MAX_CACHED_BODY_BYTES = 1024 * 1024
+
+# Responses addressed by a full SHA (contents at ref=<sha>, git blobs and trees)
+# never change, and each commit indexed asks for new ones. Revalidating them
+# would be rare, and storing them would copy every indexed commit into the cache.
+IMMUTABLE_URL_PATTERN = re.compile(r"[?&]ref=[0-9a-f]{40}(?:&|$)|/git/(?:blobs|trees)/[0-9a-f]{40}(?:[/?]|$)")
+
+_inject_lock = threading.Lock()
+
+
+class CachedResponse:
+    """Stands in for PyGithub's RequestsResponse when a 304 is answered from the cache."""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: str):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def getheaders(self) -> ItemsView[str, str]:
+        return self.headers.items()
+
+    def read(self) -> str:
+        return self.body
+
+    def iter_content(self, chunk_size: Optional[int] = 1) -> Iterator[bytes]:
+        data = self.body.encode("utf-8")
+        step = chunk_size or len(data) or 1
+        for start in range(0, len(data), step):
+            yield data[start:start + step]
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+class ConditionalRequestsConnection(HTTPSRequestsConnectionClass):
+    """
+    PyGithub HTTPS connection that revalidates GET responses with their ETag.
+
+    Successful GET responses carrying an ETag are stored in `cache_backend`
+    under a hash of the URL, the Accept header and the credentials, except
+    SHA-addressed ones (see IMMUTABLE_URL_PATTERN). Repeat
+    requests send If-None-Match; GitHub answers unchanged resources with a 304
+    that does not count against the rate limit, and the stored body is replayed.
+    `cache_backend` and `ttl_seconds` are bound per service by
+    `conditional_connection_class`.
+
+    PyGithub shares one connection per client and stores the pending request on
+    it between `request()` and `getresponse()`; this class keeps it per thread
+    so the client can be used from several threads at once.
+
+    Every response is counted in the GitHub request metrics, and its
+    rate-limit header updates the remaining-quota gauge.
+    """
+
+    cache_backend: Optional[CacheBackend] = None
+    ttl_seconds: Optional[int] = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending = threading.local()
+
+    def request(self, verb: str, url: str, input, headers: Dict[str, str], stream: bool = False) -> None:
+        self._pending.request = (verb, url, input, headers, stream)
+
+    def _send(self, verb: str, url: str, input, headers: Dict[str, str]) -> RequestsResponse:
+        response = getattr(self.session, verb.lower())(
+            url,
+            headers=headers,
+            data=input,
+            timeout=self.timeout,
+            verify=self.verify,
+            allow_redirects=False,
+        )
+        return RequestsResponse(response)
+
+    @staticmethod
+    def _cache_key(url: str, request_headers: Dict[str, str]) -> str:
+        headers = {key.lower(): value for key, value in request_headers.items()}
+        credentials = hashlib.sha256(headers.get("authorization", "").encode("utf-8")).hexdigest()
+        material = "\0".join([url, headers.get("accept", ""), credentials])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            cached = self.cache_backend.get(key)
+        except Exception as e:
+            print(f"GitHub cache read failed: {e}")
+            return None
+        return json.loads(cached) if cached is not None else None
+
+    def _store(self, key: str, response: RequestsResponse, body: str) -> None:
+        try:
+            value = json.dumps({
+                "status": response.status,
+                "etag": response.headers.get("ETag"),
+                "headers": dict(response.headers),
+                "body": body,
+            })
+            self.cache_backend.set(key, value.encode("utf-8"), ttl_seconds=self.ttl_seconds)
+        except Exception as e:
+            print(f"GitHub cache write failed: {e}")
+
+    def getresponse(self):
+        verb = self._pending.request[0]
+        response = self._getresponse()
+        # Replayed responses are counted as the 304 GitHub actually sent.
+        status = 304 if isinstance(response, CachedResponse) else response.status
+        record_github_response(verb, status, response.headers)
+        return response
+
+    def _getresponse(self):
+        verb, path, input, headers, stream = self._pending.request
+        url = f"{self.protocol}://{self.host}:{self.port}{path}"
+        if self.cache_backend is None or verb.upper() != "GET" or stream or IMMUTABLE_URL_PATTERN.search(path):
+            return self._send(verb, url, input, headers)
+
+        key = self._cache_key(url, headers)
+        cached = self._load(key)
+        if cached is not None:
+            headers = {**headers, "If-None-Match": cached["etag"]}
+
+        response = self._send(verb, url, input, headers)
+        if response.status == 304 and cached is not None:
+            # Fresh rate-limit headers from the 304, everything else as stored.
+            headers = {**cached["headers"], **dict(response.headers)}
+            return CachedResponse(cached["status"], headers, cached["body"])
+
+        if response.status == 200 and response.headers.get("ETag"):
+            body = response.read()
+            if len(body) <= MAX_CACHED_BODY_BYTES:
+                self._store(key, response, body)
+        return response
+
+
+def conditional_connection_class(
+    backend: Optional[CacheBackend], ttl_seconds: Optional[int]
+) -> Type[ConditionalRequestsConnection]:
+    return type(
+        "BoundConditionalRequestsConnection",
+        (ConditionalRequestsConnection,),
+        {"cache_backend": backend, "ttl_seconds": ttl_seconds},
+    )
+
+
+def build_github_client(
+    github_token: Optional[str], backend: Optional[CacheBackend] = None, ttl_seconds: Optional[int] = None
+) -> Github:
+    """
+    PyGithub client on a thread-safe connection, revalidating GETs through
+    `backend` when one is given.
+
+    Requester picks its connection class when it is constructed, so the class is
+    injected only around construction and other clients keep the default one.
+    """
+    with _inject_lock:
+        Requester.injectConnectionClasses(
+            HTTPRequestsConnectionClass,
+            conditional_connection_class(backend, ttl_seconds),
+        )
+        try:
+            return Github(github_token) if github_token else Github()
+        finally:
+            # Also restores connection reuse, which injection turns off.
+            Requester.resetConnectionClasses()
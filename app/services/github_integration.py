@@ -1,12 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
-from github import Github
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+from github.File import File
 from github.PullRequest import PullRequest
 from github.Repository import Repository
-from github.ContentFile import ContentFile
 import base64
+import re
+import threading
 from urllib.parse import urlparse
 
+from app.services.cache import CacheBackend
+from app.services.file_filter import FileFilter
+from app.services.github_cache import build_github_client
+from app.services.metrics import timed
+from app.services.retry import with_backoff
+from app.services.routing import PRSummary
+
+if TYPE_CHECKING:
+    from app.services.git_mirror import GitMirrorSource
+
 
 @dataclass
 class PRFile:
@@ -17,6 +31,52 @@ class PRFile:
     changes: int
     patch: Optional[str]
     content: Optional[str]
+    skip_reason: Optional[str] = None # set when the file filter rejected it; content is not fetched
+    error: Optional[str] = None # why content could not be fetched
+
+
+@dataclass(slots=True)
+class TreeEntry:
+    path: str
+    type: str # blob, tree, commit
+    sha: str
+    size: Optional[int]
+
+
+@dataclass
+class RepoTree:
+    commit_sha: str
+    entries: List[TreeEntry]
+
+    @property
+    def file_paths(self) -> List[str]:
+        return [entry.path for entry in self.entries if entry.type == "blob"]
+
+    def filtered_file_paths(self, file_filter: Optional[FileFilter]) -> List[str]:
+        if file_filter is None:
+            return self.file_paths
+        return [
+            entry.path
+            for entry in self.entries
+            if entry.type == "blob" and file_filter.allows(entry.path, entry.size)
+        ]
+
+    def render(self) -> str:
+        # Entries are in git tree order, so every directory precedes its children.
+        lines = []
+        for entry in self.entries:
+            depth = entry.path.count("/")
+            name = entry.path.rsplit("/", 1)[-1]
+            suffix = "/" if entry.type == "tree" else ""
+            lines.append(f"{'    ' * depth}{name}{suffix}\n")
+        return "".join(lines)
+
+
+@dataclass
+class ChangedFile:
+    filename: str
+    status: str # added, removed, modified, renamed
+    previous_filename: Optional[str] = None
 
 
 @dataclass
@@ -29,11 +89,101 @@ class PRDetails:
     head_sha: str
 
 
+def pr_file_content(
+    file_filter: Optional[FileFilter], filename: str, data: bytes
+) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    (content, skip_reason, error) of a changed file from its raw bytes at the PR
+    head, applying the size limit of `file_filter`. Shared by the API and mirror
+    sources. Content that is not UTF-8 is left out but the file is still
+    reviewed from its patch, as a failed fetch is.
+    """
+    if file_filter is not None and not file_filter.allows(filename, len(data)):
+        return None, file_filter.skip_reason(filename, len(data)), None
+    try:
+        return data.decode("utf-8"), None, None
+    except UnicodeDecodeError:
+        return None, None, "content is not valid UTF-8"
+
+
+# The compare API truncates its file list at this many entries.
+COMPARE_FILES_LIMIT = 300
+
+COMMIT_SHA_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+
 class GithubService:
 
 
-    def __init__(self, github_token: Optional[str] = None):
-        self.client = Github(github_token) if github_token else Github()
+    def __init__(
+        self,
+        github_token: Optional[str] = None,
+        repo_source: Optional["GitMirrorSource"] = None,
+        file_filter: Optional[FileFilter] = None,
+        http_cache: Optional[CacheBackend] = None,
+        http_cache_ttl_seconds: Optional[int] = None,
+        blob_cache: Optional[CacheBackend] = None,
+        blob_cache_ttl_seconds: Optional[int] = None,
+        blob_cache_max_entry_bytes: Optional[int] = None,
+        content_fetch_concurrency: int = 8,
+        fetch_blobs_by_sha: bool = True,
+        fetch_max_retries: int = 3,
+        fetch_retry_base_delay: float = 2.0,
+    ):
+        # GET responses are revalidated with their ETag when an HTTP cache is given.
+        self.client = build_github_client(github_token, http_cache, http_cache_ttl_seconds)
+        # When set, trees, file contents and diffs are read from the local
+        # mirror; PR metadata still comes from the API.
+        self.repo_source = repo_source
+        # When set, rejected files are listed but their contents are never fetched.
+        self.file_filter = file_filter
+        # PR file contents are fetched on a pool of this size; with
+        # fetch_blobs_by_sha they are read as git blobs and cached by blob SHA,
+        # except blobs over blob_cache_max_entry_bytes.
+        self.blob_cache = blob_cache
+        self.blob_cache_ttl_seconds = blob_cache_ttl_seconds
+        self.blob_cache_max_entry_bytes = blob_cache_max_entry_bytes
+        self.content_fetch_concurrency = content_fetch_concurrency
+        self.fetch_blobs_by_sha = fetch_blobs_by_sha
+        self.fetch_max_retries = fetch_max_retries
+        self.fetch_retry_base_delay = fetch_retry_base_delay
+        # Each task_scope gets its own memo in this context, so tasks running
+        # concurrently on other threads or coroutines never see each other's.
+        self._memo: ContextVar[Optional[Dict[Tuple, object]]] = ContextVar(
+            f"github_memo_{id(self)}", default=None
+        )
+        self._memo_lock = threading.Lock()
+
+    @contextmanager
+    def task_scope(self) -> Iterator[None]:
+        """
+        Remember repositories and PR details for the duration of a task.
+
+        Inside the scope repeated `_get_repo` and `get_pr_details` calls for the
+        same arguments return the first result. The memo belongs to the current
+        thread or coroutine context; a nested scope reuses the enclosing one,
+        and it is dropped when the outermost scope exits, so the next task sees
+        fresh data.
+        """
+        if self._memo.get() is not None:
+            yield
+            return
+        token = self._memo.set({})
+        try:
+            yield
+        finally:
+            self._memo.reset(token)
+
+    def _memoized(self, key: Tuple, load):
+        memo = self._memo.get()
+        if memo is None:
+            return load()
+        with self._memo_lock:
+            if key in memo:
+                return memo[key]
+        value = load()
+        with self._memo_lock:
+            return memo.setdefault(key, value)
 
     
     def _parse_repo_url(self, repo_url: str) -> Tuple[str, str]:
@@ -46,82 +196,107 @@ class GithubService:
 
 
     def get_default_branch(self, repo_url: str) -> str:
+        if self.repo_source is not None:
+            return self.repo_source.get_default_branch(repo_url)
         repo = self._get_repo(repo_url=repo_url)
         return repo.default_branch
+
+    def get_branch_head_sha(self, repo_url: str, branch: Optional[str] = None) -> str:
+        if self.repo_source is not None:
+            return self.repo_source.resolve_commit(repo_url, branch)
+        repo = self._get_repo(repo_url=repo_url)
+        return repo.get_branch(branch or repo.default_branch).commit.sha
  
     
     def _get_repo(self, repo_url: str) -> Repository:
         owner, repo_name = self._parse_repo_url(repo_url=repo_url)
-        return self.client.get_repo(f"{owner}/{repo_name}")
-
-
-    def _get_repo_content(self, repo_url: str, path: str = ""):
+        full_name = f"{owner}/{repo_name}"
+        return self._memoized(("repo", full_name.lower()), lambda: self.client.get_repo(full_name))
+
+
+    def _resolve_commit_sha(self, repo: Repository, ref: Optional[str]) -> str:
+        if ref and COMMIT_SHA_PATTERN.match(ref):
+            return ref
+        if ref is None:
+            return repo.get_branch(repo.default_branch).commit.sha
+        return repo.get_commit(ref).sha
+
+    def _walk_git_tree(self, repo: Repository, tree_sha: str, prefix: str, entries: List[TreeEntry]) -> None:
+        # Only used when the recursive listing is truncated (very large trees).
+        for element in repo.get_git_tree(tree_sha).tree:
+            path = f"{prefix}{element.path}"
+            size = element.size if element.type == "blob" else None
+            entries.append(TreeEntry(path=path, type=element.type, sha=element.sha, size=size))
+            if element.type == "tree":
+                self._walk_git_tree(repo, element.sha, f"{path}/", entries)
+
+    def get_repo_tree(self, repo_url: str, ref: Optional[str] = None) -> RepoTree:
+        """Full file tree at `ref` (default branch head when omitted), pinned to a commit SHA."""
+        with timed("github.tree"):
+            return self._get_repo_tree(repo_url, ref)
+
+    def _get_repo_tree(self, repo_url: str, ref: Optional[str] = None) -> RepoTree:
+        if self.repo_source is not None:
+            return self.repo_source.get_repo_tree(repo_url, ref)
         repo = self._get_repo(repo_url=repo_url)
-        contents = repo.get_contents(path)
-        return contents
-
-    def _build_tree_structure(
-        self, repo: Repository, contents: list[ContentFile] | ContentFile, tree_structure: str, file_paths: list,  level: int):
-
-        while contents:
-            file_content = contents.pop(0)
-            current_path = file_content.path
-
-            # Add proper indentation based on the level
-            indentation = "    " * level
-            if file_content.type == "dir":
-                tree_structure += f"{indentation}{file_content.name}/\n"
-                new_contents = repo.get_contents(file_content.path)
-                # Recursively call _traverse with an increased level
-                tree_structure = self._build_tree_structure(
-                    repo=repo, contents=new_contents, file_paths=file_paths, tree_structure=tree_structure, level=level + 1)
-            else:
-                tree_structure += f"{indentation}{file_content.name}\n"
-                file_paths.append(current_path)
+        commit_sha = self._resolve_commit_sha(repo, ref)
+        git_tree = repo.get_git_tree(commit_sha, recursive=True)
 
-        return tree_structure
+        entries = []
+        if git_tree.truncated:
+            self._walk_git_tree(repo, commit_sha, "", entries)
+        else:
+            for element in git_tree.tree:
+                size = element.size if element.type == "blob" else None
+                entries.append(TreeEntry(path=element.path, type=element.type, sha=element.sha, size=size))
 
-    def get_tree_strucutre_and_file_paths(self, repo_url: str):
-        
-        repo = self._get_repo(repo_url=repo_url)
-        contents = self._get_repo_content(repo_url=repo_url)
+        return RepoTree(commit_sha=commit_sha, entries=entries)
 
-        tree_structure = ""
-        file_paths = []
+    def get_tree_strucutre_and_file_paths(self, repo_url: str, ref: Optional[str] = None):
+        tree = self.get_repo_tree(repo_url=repo_url, ref=ref)
+        return tree.render(), tree.filtered_file_paths(self.file_filter)
 
-        tree_structure = self._build_tree_structure(repo=repo, contents=contents, tree_structure=tree_structure, file_paths=file_paths, level=0)
-        return tree_structure, file_paths
+    def _skip_reason(self, file_path: str) -> Optional[str]:
+        if self.file_filter is None:
+            return None
+        return self.file_filter.skip_reason(file_path)
 
     
     def get_pr_details(self, repo_url: str, pr_number: int) -> PRDetails:
+        owner, repo_name = self._parse_repo_url(repo_url=repo_url)
+        key = ("pr_details", f"{owner}/{repo_name}".lower(), pr_number)
+        return self._memoized(key, lambda: self._fetch_pr_details(repo_url, pr_number))
+
+    @timed("github.pr_details")
+    def _fetch_pr_details(self, repo_url: str, pr_number: int) -> PRDetails:
 
         try:
             repo = self._get_repo(repo_url=repo_url)
             pr: PullRequest = repo.get_pull(number=pr_number)
 
-            files = []
-            for file in pr.get_files():
-
-                content = None
-                if file.status != 'removed':
-                    try:
-                        file_content = repo.get_contents(file.filename, ref=pr.head.sha)
-                        if isinstance(file_content, (list, tuple)):
-                            continue
-                        content = base64.b64decode(file_content.content).decode('utf-8')
-                    except Exception as e:
-                        print(f"Error fetching content for {file.filename}: {e}")
-
-                files.append(PRFile(
-                    filename=file.filename,
-                    status=file.status,
-                    additions=file.additions,
-                    deletions=file.deletions,
-                    changes=file.changes,
-                    patch=file.patch,
-                    content=content
-                ))
-
+            if self.repo_source is not None:
+                return PRDetails(
+                    title=pr.title,
+                    description=pr.body or "",
+                    state=pr.state,
+                    files=self.repo_source.get_pr_files(
+                        repo_url, pr_number, pr.base.sha, pr.head.sha, file_filter=self.file_filter
+                    ),
+                    diff=pr.diff_url,
+                    head_sha=pr.head.sha
+                )
+
+            pr_files = list(pr.get_files())
+            head_sha = pr.head.sha
+
+            def fetch(file: File) -> PRFile:
+                return self._build_pr_file(repo, file, head_sha)
+
+            if self.content_fetch_concurrency > 1 and len(pr_files) > 1:
+                with ThreadPoolExecutor(max_workers=min(self.content_fetch_concurrency, len(pr_files))) as executor:
+                    files = list(executor.map(fetch, pr_files))
+            else:
+                files = [fetch(file) for file in pr_files]
 
             return PRDetails(
                 title=pr.title,
@@ -136,11 +311,89 @@ class GithubService:
             raise Exception(f"Error fetching PR Details: {e}")
 
     
+    def _with_backoff(self, call):
+        return with_backoff(call, self.fetch_max_retries, self.fetch_retry_base_delay)
+
+    def _get_blob(self, repo: Repository, blob_sha: str) -> bytes:
+        # Blobs are content-addressed, so a cached blob never goes stale.
+        if self.blob_cache is not None:
+            try:
+                cached = self.blob_cache.get(blob_sha)
+            except Exception as e:
+                print(f"Blob cache read failed: {e}")
+                cached = None
+            if cached is not None:
+                return cached
+        blob = self._with_backoff(lambda: repo.get_git_blob(blob_sha))
+        data = base64.b64decode(blob.content) if blob.encoding == "base64" else blob.content.encode("utf-8")
+        cacheable = self.blob_cache_max_entry_bytes is None or len(data) <= self.blob_cache_max_entry_bytes
+        if self.blob_cache is not None and cacheable:
+            try:
+                self.blob_cache.set(blob_sha, data, ttl_seconds=self.blob_cache_ttl_seconds)
+            except Exception as e:
+                print(f"Blob cache write failed: {e}")
+        return data
+
+    def _get_contents(self, repo: Repository, file_path: str, ref: str) -> bytes:
+        content_file = self._with_backoff(lambda: repo.get_contents(file_path, ref=ref))
+        if isinstance(content_file, (list, tuple)):
+            raise ValueError(f"{file_path} is a directory")
+        return base64.b64decode(content_file.content)
+
+    def _build_pr_file(self, repo: Repository, file: File, head_sha: str) -> PRFile:
+        content = None
+        error = None
+        skip_reason = self._skip_reason(file.filename)
+        if file.status != 'removed' and skip_reason is None:
+            try:
+                with timed("github.content"):
+                    if self.fetch_blobs_by_sha and file.sha:
+                        data = self._get_blob(repo, file.sha)
+                    else:
+                        data = self._get_contents(repo, file.filename, head_sha)
+                content, skip_reason, error = pr_file_content(self.file_filter, file.filename, data)
+            except Exception as e:
+                error = str(e)
+                print(f"Error fetching content for {file.filename}: {e}")
+
+        return PRFile(
+            filename=file.filename,
+            status=file.status,
+            additions=file.additions,
+            deletions=file.deletions,
+            changes=file.changes,
+            patch=file.patch,
+            content=content,
+            skip_reason=skip_reason,
+            error=error
+        )
+
+    def get_open_pull_requests(self, repo_url: str) -> List[Tuple[int, str]]:
+        """(number, head SHA) of every open PR."""
+        repo = self._get_repo(repo_url=repo_url)
+        return [(pr.number, pr.head.sha) for pr in repo.get_pulls(state="open")]
+
+    def get_pr_summary(self, repo_url: str, pr_number: int) -> "PRSummary":
+        """Head SHA and size figures of a PR from two cheap metadata calls, without listing files."""
+        repo = self._get_repo(repo_url=repo_url)
+        pr = repo.get_pull(number=pr_number)
+        return PRSummary(
+            head_sha=pr.head.sha,
+            changed_files=pr.changed_files,
+            additions=pr.additions,
+            deletions=pr.deletions,
+            repo_size_kb=repo.size,
+        )
+
+    
     def get_file_content(self, repo_url: str, file_path: str, ref: str) -> Optional[str]:
 
+        if self.repo_source is not None:
+            return self.repo_source.get_file_content(repo_url, file_path, ref)
         try:
             repo = self._get_repo(repo_url)
-            content_file = repo.get_contents(file_path, ref=ref)
+            with timed("github.content"):
+                content_file = repo.get_contents(file_path, ref=ref)
             if isinstance(content_file, (list, tuple)):
                 return None
             return base64.b64decode(content_file.content).decode('utf-8')
@@ -149,26 +402,39 @@ class GithubService:
             return None
 
 
-    def get_github_repo_complete_data(self, repo_url: str) -> Tuple[str, List[str], List[dict]]:
-        directory_tree, file_paths = self.get_tree_strucutre_and_file_paths(repo_url=repo_url)
-        branch = self.get_default_branch(repo_url=repo_url)
+    def iter_file_contents(self, repo_url: str, file_paths: Iterable[str], ref: str) -> Iterator[Tuple[str, Optional[str]]]:
+        if self.repo_source is not None:
+            yield from self.repo_source.iter_file_contents(repo_url, file_paths, ref)
+            return
+        for file_path in file_paths:
+            yield file_path, self.get_file_content(repo_url=repo_url, file_path=file_path, ref=ref)
+
+
+    def get_github_repo_complete_data(self, repo_url: str) -> Tuple[str, List[str], Iterator[dict]]:
+        """
+        Directory tree, file paths and a lazy iterator of file contents.
 
-        contents = []
+        Contents are fetched one file at a time as the iterator is consumed,
+        so callers that process and drop each file never hold the whole repo.
+        """
+        tree = self.get_repo_tree(repo_url=repo_url)
+        directory_tree = tree.render()
+        file_paths = tree.filtered_file_paths(self.file_filter)
 
-        for path in file_paths:
-            file_content = self.get_file_content(repo_url=repo_url, file_path=path, ref= branch)
-            filetype = ""
+        def contents() -> Iterator[dict]:
+            for path, file_content in self.iter_file_contents(repo_url=repo_url, file_paths=file_paths, ref=tree.commit_sha):
+                filetype = ""
 
-            if ("." in path):
-                filetype = path.split(".")[-1]
+                if ("." in path):
+                    filetype = path.split(".")[-1]
 
-            contents.append({
-                "filename": path,
-                "filetype": filetype,
-                "content": file_content
-            })
+                yield {
+                    "filename": path,
+                    "filetype": filetype,
+                    "content": file_content
+                }
 
-        return directory_tree, file_paths, contents
+        return directory_tree, file_paths, contents()
 
     def get_diff_sections(self, repo_url: str, pr_number: int) -> List[str]:
         try:
@@ -177,6 +443,36 @@ class GithubService:
         except Exception as e:
             raise Exception(f"Error fetching diff sections: {e}")
 
+    def get_changed_files(self, repo_url: str, base_sha: str, head_sha: str) -> Optional[List[ChangedFile]]:
+        """
+        Files changed between two commits of the same branch.
+
+        Returns None when the delta cannot be trusted for incremental work:
+        the head does not descend from the base (force push) or the compare
+        API truncated the file list.
+        """
+        if self.repo_source is not None:
+            return self.repo_source.get_changed_files(repo_url, base_sha, head_sha)
+        try:
+            repo = self._get_repo(repo_url=repo_url)
+            comparison = repo.compare(base_sha, head_sha)
+            if comparison.status not in ("ahead", "identical"):
+                return None
+            files = comparison.files
+            if len(files) >= COMPARE_FILES_LIMIT:
+                return None
+            return [
+                ChangedFile(
+                    filename=file.filename,
+                    status=file.status,
+                    previous_filename=file.previous_filename,
+                )
+                for file in files
+            ]
+        except Exception as e:
+            print(f"Error comparing {base_sha}...{head_sha}: {e}")
+            return None
+
     
     def get_commit_history(self, repo_url: str, branch: Optional[str] = None) -> List[dict]:
         try:
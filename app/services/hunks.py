@@ -0,0 +1,130 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+HUNK_HEADER_PATTERN = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@.*$")
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    lines: List[str] = field(default_factory=list) # header followed by the hunk body
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+def parse_hunks(patch: Optional[str]) -> List[Hunk]:
+    """Split a unified diff (as GitHub returns per file) into its hunks."""
+    hunks: List[Hunk] = []
+    for line in (patch or "").splitlines():
+        match = HUNK_HEADER_PATTERN.match(line)
+        if match:
+            old_start, old_count, new_start, new_count = match.groups()
+            hunks.append(Hunk(
+                old_start=int(old_start),
+                old_count=int(old_count) if old_count is not None else 1,
+                new_start=int(new_start),
+                new_count=int(new_count) if new_count is not None else 1,
+                lines=[line],
+            ))
+        elif hunks:
+            hunks[-1].lines.append(line)
+    return hunks
+
+
+@dataclass
+class HunkWindow:
+    """One or more neighbouring hunks and the lines [start, end] of the new file shown around them."""
+
+    hunks: List[Hunk]
+    start: int
+    end: int
+
+    @property
+    def patch(self) -> str:
+        return "\n".join(hunk.text for hunk in self.hunks)
+
+    def render(self, content: Optional[str]) -> str:
+        """The window's lines of `content`, each prefixed with its line number in the file."""
+        if content is None:
+            return "(file content unavailable)"
+        lines = content.splitlines()[self.start - 1:self.end]
+        return "\n".join(f"{self.start + offset:>6} | {line}" for offset, line in enumerate(lines))
+
+
+def split_hunk(hunk: Hunk, max_lines: int) -> List[Hunk]:
+    """`hunk` cut into consecutive hunks of at most `max_lines` body lines, each with its own header."""
+    body = hunk.lines[1:]
+    if len(body) <= max_lines:
+        return [hunk]
+    pieces: List[Hunk] = []
+    old_line, new_line = hunk.old_start, hunk.new_start
+    for offset in range(0, len(body), max_lines):
+        lines = body[offset:offset + max_lines]
+        # "\ No newline at end of file" markers belong to neither side.
+        old_count = sum(1 for line in lines if not line.startswith(("+", "\\")))
+        new_count = sum(1 for line in lines if not line.startswith(("-", "\\")))
+        pieces.append(Hunk(
+            old_start=old_line,
+            old_count=old_count,
+            new_start=new_line,
+            new_count=new_count,
+            lines=[f"@@ -{old_line},{old_count} +{new_line},{new_count} @@", *lines],
+        ))
+        old_line += old_count
+        new_line += new_count
+    return pieces
+
+
+def hunk_windows(
+    hunks: List[Hunk], context_lines: int, total_lines: Optional[int] = None, max_lines: Optional[int] = None
+) -> List[HunkWindow]:
+    """
+    One window of `context_lines` before and after each hunk's new-file range;
+    hunks whose windows overlap share one window so no line is reviewed twice.
+
+    With `max_lines`, no window shows more than `max_lines` file lines or patch
+    lines: longer hunks are split, context shrinks around long pieces, and
+    neighbours that would overflow get windows of their own, which may then
+    overlap by some context.
+    """
+    if max_lines:
+        hunks = [piece for hunk in hunks for piece in split_hunk(hunk, max(max_lines - 1, 1))]
+    windows: List[HunkWindow] = []
+    for hunk in sorted(hunks, key=lambda hunk: hunk.new_start):
+        first_line = max(hunk.new_start, 1)
+        last_line = hunk.new_start + max(hunk.new_count, 1) - 1
+        context = context_lines
+        if max_lines:
+            context = min(context, max(0, (max_lines - (last_line - first_line + 1)) // 2))
+        start = max(1, first_line - context)
+        end = last_line + context
+        if total_lines is not None:
+            end = min(end, max(total_lines, 1))
+        if windows and start <= windows[-1].end + 1 and _fits(windows[-1], hunk, end, max_lines):
+            windows[-1].hunks.append(hunk)
+            windows[-1].end = max(windows[-1].end, end)
+        else:
+            windows.append(HunkWindow(hunks=[hunk], start=start, end=end))
+    return windows
+
+
+def _fits(window: HunkWindow, hunk: Hunk, end: int, max_lines: Optional[int]) -> bool:
+    if not max_lines:
+        return True
+    patch_lines = sum(len(existing.lines) for existing in window.hunks) + len(hunk.lines)
+    return patch_lines <= max_lines and max(window.end, end) - window.start + 1 <= max_lines
+
+
+def content_windows(total_lines: int, max_lines: int) -> List[HunkWindow]:
+    """Consecutive windows of at most `max_lines` covering the file, for changes that come without a patch."""
+    return [
+        HunkWindow(hunks=[], start=start, end=min(start + max_lines - 1, total_lines))
+        for start in range(1, total_lines + 1, max_lines)
+    ]
@@ -0,0 +1,145 @@
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from langchain_chroma import Chroma
+
+from app.services.metrics import timed
+
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def bounded_iter(iterable: Iterable[T], maxsize: int) -> Iterator[T]:
+    """
+    Drain `iterable` on a background thread through a queue of `maxsize` items.
+
+    The producer runs ahead of the consumer by at most `maxsize` items and
+    blocks when the queue is full, so a slow consumer throttles it instead of
+    letting items pile up. Producer exceptions are re-raised in the consumer;
+    if the consumer stops early the producer is told to stop and closed.
+    """
+    items: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    break
+            else:
+                put(_DONE)
+        except BaseException as exc:
+            put(_Failure(exc))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+@dataclass
+class IngestionStats:
+    files: int = 0
+    chunks: int = 0
+    batches: int = 0
+
+
+class IngestionPipeline:
+    """
+    fetch -> split -> embed/store, as generators connected by bounded queues.
+
+    Files are fetched on one thread and split on another while the caller's
+    thread embeds and writes the previous batch, so network, CPU and the
+    embedding provider overlap. At most `queue_size` fetched files and two
+    pending chunk batches exist at any time, which keeps peak memory flat
+    regardless of repository size; nothing is retained once it is stored.
+    """
+
+    def __init__(self, split_text: Callable[[str], List[str]], batch_chunks: int = 1000, queue_size: int = 32):
+        self.split_text = split_text
+        self.batch_chunks = batch_chunks
+        self.queue_size = queue_size
+
+    def _chunk_batches(
+        self,
+        contents: Iterable[Tuple[str, Optional[str]]],
+        stats: IngestionStats,
+        extra: Optional[Tuple[str, Dict]] = None,
+        base_metadata: Optional[Dict] = None,
+    ) -> Iterator[Tuple[List[str], List[Dict]]]:
+        base_metadata = base_metadata or {}
+        texts: List[str] = []
+        metadatas: List[Dict] = []
+        for file_path, file_content in contents:
+            if not file_content:
+                continue
+            stats.files += 1
+            chunks = self.split_text(file_content)
+            texts.extend(chunks)
+            metadatas.extend({**base_metadata, "file": file_path, "type": "content"} for _ in chunks)
+            if len(texts) >= self.batch_chunks:
+                yield texts, metadatas
+                texts, metadatas = [], []
+        if extra is not None:
+            texts.append(extra[0])
+            metadatas.append({**base_metadata, **extra[1]})
+        if texts:
+            yield texts, metadatas
+
+    def run(
+        self,
+        vector_store: Chroma,
+        contents: Iterable[Tuple[str, Optional[str]]],
+        extra: Optional[Tuple[str, Dict]] = None,
+        base_metadata: Optional[Dict] = None,
+    ) -> IngestionStats:
+        """
+        Index `contents` (path, text) pairs into `vector_store`, plus an optional
+        extra document; `base_metadata` is added to every document's metadata.
+        """
+        stats = IngestionStats()
+        fetched = bounded_iter(contents, self.queue_size)
+        batches = bounded_iter(self._chunk_batches(fetched, stats, extra, base_metadata), 2)
+        try:
+            for texts, metadatas in batches:
+                # Embedding (timed on its own as index.embed) plus the vector store write.
+                with timed("index.store"):
+                    vector_store.add_texts(texts=texts, metadatas=metadatas)
+                stats.chunks += len(texts)
+                stats.batches += 1
+        finally:
+            # Stops the fetch and split threads if storing failed part way.
+            batches.close()
+        return stats
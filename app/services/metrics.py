@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Mapping, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+
+# Set (to an empty, writable directory) when several processes record metrics,
+# as Celery prefork children do; each process then writes its samples there and
+# one exporter aggregates them.
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+STAGE_SECONDS = Histogram(
+    "review_stage_seconds",
+    "Time spent in each stage of a review",
+    ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+LLM_CALLS = Counter("review_llm_calls", "LLM calls by purpose (review or repair)", ["purpose"])
+LLM_TOKENS = Counter("review_llm_tokens", "LLM tokens by purpose and kind (prompt or completion)", ["purpose", "kind"])
+REVIEW_CACHE_LOOKUPS = Counter("review_cache_lookups", "Per-file review cache lookups by result (hit or miss)", ["result"])
+EMBEDDING_CHUNKS = Counter("review_embedding_chunks", "Indexed chunks by vector source (cached or embedded)", ["source"])
+GITHUB_REQUESTS = Counter("github_requests", "GitHub API responses by method and status", ["method", "status"])
+GITHUB_RATE_LIMIT_REMAINING = Gauge(
+    "github_rate_limit_remaining",
+    "Requests left in the current GitHub rate-limit window, as last reported",
+    multiprocess_mode="livemin",
+)
+
+
+class TaskTimings:
+    """
+    Seconds and call counts per stage, plus token counts, for one task.
+
+    Stages that run on several threads at once (file fetches, file reviews)
+    are summed across threads, so they can add up to more than wall time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._tokens: Dict[str, int] = {}
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"seconds": 0.0, "count": 0})
+            entry["seconds"] += seconds
+            entry["count"] += 1
+
+    def add_tokens(self, kind: str, count: int) -> None:
+        with self._lock:
+            self._tokens[kind] = self._tokens.get(kind, 0) + count
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "stages": {
+                    stage: {"seconds": round(entry["seconds"], 3), "count": int(entry["count"])}
+                    for stage, entry in self._stages.items()
+                },
+                "tokens": dict(self._tokens),
+            }
+
+
+# Timings of the task this process is running. Workers use the prefork pool
+# (one task per process at a time), so a process-wide slot reaches the
+# task's helper threads too.
+_current_timings: Optional[TaskTimings] = None
+
+
+@contextmanager
+def collect_timings() -> Iterator[TaskTimings]:
+    global _current_timings
+    previous = _current_timings
+    _current_timings = TaskTimings()
+    try:
+        yield _current_timings
+    finally:
+        _current_timings = previous
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Observe the block's duration under `stage`, and add it to the current task's timings."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(seconds)
+        timings = _current_timings
+        if timings is not None:
+            timings.add_stage(stage, seconds)
+
+
+def record_llm_call(purpose: str, response) -> None:
+    """Count an LLM call and the tokens LangChain reports in `usage_metadata`, when present."""
+    LLM_CALLS.labels(purpose).inc()
+    usage = getattr(response, "usage_metadata", None) or {}
+    timings = _current_timings
+    for kind, field in (("prompt", "input_tokens"), ("completion", "output_tokens")):
+        count = usage.get(field) or 0
+        if count:
+            LLM_TOKENS.labels(purpose, kind).inc(count)
+            if timings is not None:
+                timings.add_tokens(kind, count)
+
+
+def record_github_response(method: str, status: int, headers: Mapping[str, str]) -> None:
+    GITHUB_REQUESTS.labels(method.upper(), str(status)).inc()
+    for name, value in headers.items():
+        if name.lower() == "x-ratelimit-remaining":
+            try:
+                GITHUB_RATE_LIMIT_REMAINING.set(int(value))
+            except (TypeError, ValueError):
+                pass
+            break
+
+
+def _registry() -> CollectorRegistry:
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics() -> bytes:
+    """Current metrics in the Prometheus text format, aggregated across processes in multiprocess mode."""
+    return generate_latest(_registry())
+
+
+def start_metrics_server(port: int) -> None:
+    """Serve /metrics on `port` from a background thread of this process."""
+    start_http_server(port, registry=_registry())
+
+
+def clear_multiprocess_dir() -> None:
+    """Drop samples left by processes of an earlier run; call once before starting any worker process."""
+    directory = os.environ.get(MULTIPROC_DIR_ENV)
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".db"):
+            os.remove(os.path.join(directory, name))
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop live gauges of an exited worker process so they stop counting in livemin/livesum."""
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        multiprocess.mark_process_dead(pid)
@@ -1,5 +1,6 @@
-from typing import Dict, List
-from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
 from app.services import GithubService
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
@@ -7,15 +8,139 @@ from langchain_text_splitters import (
     RecursiveCharacterTextSplitter,
 )
 from langchain_chroma import Chroma
-from app.services.github_integration import PRDetails
+from app.services.github_integration import ChangedFile, PRDetails, PRFile
+from app.services.repo_index import RepoIndexEntry, RepoIndexStore, repo_key
+from app.services.cache import ReviewCache
+from app.services.embeddings import DedupEmbeddings, EmbeddingStore
+from app.services.ingestion import IngestionPipeline
+from app.services.hunks import HunkWindow, content_windows, hunk_windows, parse_hunks
+from app.services.metrics import REVIEW_CACHE_LOOKUPS, record_llm_call, timed
+from app.services.retry import with_backoff
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
+import threading
+
+FILE_REVIEW_TEMPLATE = """
+You are an expert code reviewer analyzing ONE changed file.
+
+Repository structure:
+{repo_structure}
+
+Related repository context:
+{relevant_context}
+
+Changed file: {filename}
+File status: {file_status}
+Additions: {file_additions}
+Deletions: {file_deletions}
+
+PR patch for this file:
+{file_patch}
+
+Current file content at PR head:
+{file_content}
+
+Find as many real issues as possible in this file's changed behavior. Do not stop at the first issue.
+Focus on correctness bugs, edge cases, logic errors, unsafe behavior, and maintainability concerns.
+
+Return ONLY valid JSON (no prose, no markdown) with this shape:
+{{
+  "files": [
+    {{
+      "filename": "string",
+      "issue_type": "string",
+      "line_number_of_issue": 0,
+      "issue_description": "string",
+      "suggestions": "string"
+    }}
+  ],
+  "summary": {{
+    "total_files_changed": 1,
+    "total_issues": 0,
+    "critical_issues": 0
+  }}
+}}
+"""
+
+FILE_REVIEW_PROMPT = ChatPromptTemplate.from_template(FILE_REVIEW_TEMPLATE)
+
+HUNK_REVIEW_TEMPLATE = """
+You are an expert code reviewer analyzing ONE REGION of a large changed file.
+Only this region's diff hunks and the lines around them are shown.
+
+Related repository context:
+{relevant_context}
+
+Changed file: {filename}
+File status: {file_status}
+Region {window_index} of {window_count}: lines {window_start}-{window_end}
+
+PR patch hunks in this region:
+{hunk_patch}
+
+File content at PR head for this region (line number | code):
+{window_content}
+
+Find as many real issues as possible in the changed lines of this region. Do not stop at the first issue.
+Focus on correctness bugs, edge cases, logic errors, unsafe behavior, and maintainability concerns.
+line_number_of_issue must be the file line number shown on the left of the code (between {window_start} and {window_end}),
+never a position counted from the start of this region.
+
+Return ONLY valid JSON (no prose, no markdown) with this shape:
+{{
+  "files": [
+    {{
+      "filename": "string",
+      "issue_type": "string",
+      "line_number_of_issue": 0,
+      "issue_description": "string",
+      "suggestions": "string"
+    }}
+  ],
+  "summary": {{
+    "total_files_changed": 1,
+    "total_issues": 0,
+    "critical_issues": 0
+  }}
+}}
+"""
+
+HUNK_REVIEW_PROMPT = ChatPromptTemplate.from_template(HUNK_REVIEW_TEMPLATE)
+
+LLM_GENERATION_PARAMS = {
+    "temperature": 0.3,
+    "top_k": 40,
+    "top_p": 0.95,
+    "max_output_tokens": 4096,
+    "response_mime_type": "application/json",
+}
+
+
+def file_patch_hash(file: PRFile) -> str:
+    """Identity of a file's change within a PR; unchanged across pushes that do not touch the file."""
+    material = "\0".join([file.filename, file.status, file.patch or ""])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class FileReviewError(Exception):
+    """Some files could not be reviewed after their retries; the others completed and were reported."""
+
+    def __init__(self, failures: Dict[str, Exception]):
+        self.failures = failures
+        details = "; ".join(f"{filename}: {exc}" for filename, exc in failures.items())
+        super().__init__(f"Review failed for {len(failures)} file(s): {details}")
+
 
 @dataclass
 class RepoContext:
     repo_url: str
     files: List[str]
     tree_structure: str
-    file_contents: List[Dict]
+    commit_sha: Optional[str] = None
+    index_stats: Optional[Dict] = None
+    # Handle to this repository's own collection; documents are also tagged with "repo".
+    vector_store: Optional[Chroma] = field(default=None, repr=False, compare=False)
 
 
 class CodeReviewAgent:
@@ -25,30 +150,75 @@ class CodeReviewAgent:
         api_key: str,
         chat_model: str,
         embedding_model: str,
+        index_dir: Optional[str] = None,
+        index_max_age_seconds: int = 7 * 24 * 3600,
+        index_max_bytes: int = 5 * 1024 ** 3,
+        review_concurrency: int = 1,
+        llm_max_retries: int = 3,
+        llm_retry_base_delay: float = 2.0,
+        review_cache: Optional[ReviewCache] = None,
+        embedding_store: Optional[EmbeddingStore] = None,
+        embedding_batch_size: int = 100,
+        embedding_concurrency: int = 4,
+        index_batch_chunks: int = 1000,
+        index_queue_size: int = 32,
+        max_open_indexes: int = 8,
+        file_max_retries: int = 2,
+        large_file_lines: int = 1000,
+        hunk_context_lines: int = 40,
     ):
         self.github_client = github_service
+        self.chat_model = chat_model
+        self.review_cache = review_cache
         try:
             self.llm = ChatGoogleGenerativeAI(
                 model=chat_model,
                 google_api_key=api_key,
-                temperature=0.3,
-                top_k=40,
-                top_p=0.95,
-                max_output_tokens=4096,
-                response_mime_type="application/json",
+                **LLM_GENERATION_PARAMS,
             )
 
-            self.embeddings = GoogleGenerativeAIEmbeddings(
+            self.embeddings = DedupEmbeddings(
+                GoogleGenerativeAIEmbeddings(
+                    model=embedding_model,
+                    google_api_key=api_key,
+                    task_type="retrieval_document",
+                ),
                 model=embedding_model,
-                google_api_key=api_key,
-                task_type="retrieval_document",
+                store=embedding_store,
+                batch_size=embedding_batch_size,
+                concurrency=embedding_concurrency,
+                max_retries=llm_max_retries,
+                retry_base_delay=llm_retry_base_delay,
             )
 
         except Exception as e:
             raise Exception(f"Failed to initialize Gemini API: {e}")
 
         self.vector_store = None
+        self.max_open_indexes = max_open_indexes
+        self._memory_indexes: "OrderedDict[Tuple[str, str], RepoContext]" = OrderedDict()
+        self._memory_indexes_lock = threading.Lock()
         self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200)
+        self.review_concurrency = review_concurrency
+        self.llm_max_retries = llm_max_retries
+        self.llm_retry_base_delay = llm_retry_base_delay
+        self.file_max_retries = file_max_retries
+        self.large_file_lines = large_file_lines
+        self.hunk_context_lines = hunk_context_lines
+        self.ingestion = IngestionPipeline(
+            split_text=self.text_splitter.split_text,
+            batch_chunks=index_batch_chunks,
+            queue_size=index_queue_size,
+        )
+        self.repo_index = None
+        if index_dir:
+            self.repo_index = RepoIndexStore(
+                root_dir=index_dir,
+                embeddings=self.embeddings,
+                max_age_seconds=index_max_age_seconds,
+                max_bytes=index_max_bytes,
+                max_open=max_open_indexes,
+            )
 
     @staticmethod
     def _coerce_llm_text(review) -> str:
@@ -68,107 +238,375 @@ class CodeReviewAgent:
             return str(content)
         return str(review)
 
-    def setup_repo_context(self, repo_url: str) -> RepoContext:
-        tree_structure, file_paths = self.github_client.get_tree_strucutre_and_file_paths(repo_url)
-        default_branch = self.github_client.get_default_branch(repo_url)
-        texts = []
-        metadatas = []
-        file_contents = []
-
-        for file_path in file_paths:
-            file_content = self.github_client.get_file_content(repo_url, file_path, ref=default_branch)
-            if file_content:
-                file_contents.append({"filename": file_path, "content": file_content})
-                chunks = self.text_splitter.split_text(file_content)
-                texts.extend(chunks)
-                metadatas.extend([{"file": file_path, "type": "content"}] * len(chunks))
-
-        texts.append(tree_structure)
-        metadatas.append({"type": "structure"})
-
-        if self.vector_store is None:
-            self.vector_store = Chroma(collection_name="repo_context", embedding_function=self.embeddings)
-
-        self.vector_store.add_texts(texts=texts, metadatas=metadatas)
-
-        return RepoContext(repo_url=repo_url, files=file_paths, tree_structure=tree_structure, file_contents=file_contents)
+    def _embed_files(self, vector_store: Chroma, repo_url: str, file_paths: List[str], ref: str, tree_structure: str) -> None:
+        contents = self.github_client.iter_file_contents(repo_url, file_paths, ref=ref)
+        stats = self.ingestion.run(
+            vector_store,
+            contents,
+            extra=(tree_structure, {"type": "structure"}),
+            base_metadata={"repo": repo_key(repo_url)},
+        )
+        print(f"Stored {stats.chunks} chunks from {stats.files} files of {repo_url} in {stats.batches} batches")
+
+    def _index_repo(self, vector_store: Chroma, repo_url: str, ref: str) -> Tuple[str, List[str]]:
+        tree_structure, file_paths = self.github_client.get_tree_strucutre_and_file_paths(repo_url, ref=ref)
+        self._embed_files(vector_store, repo_url, file_paths, ref, tree_structure)
+        return tree_structure, file_paths
+
+    def _update_index(
+        self, vector_store: Chroma, repo_url: str, ref: str, changes: List[ChangedFile]
+    ) -> Tuple[str, List[str]]:
+        tree_structure, file_paths = self.github_client.get_tree_strucutre_and_file_paths(repo_url, ref=ref)
+        present = set(file_paths)
+
+        stale = set()
+        refreshed = []
+        for change in changes:
+            stale.add(change.filename)
+            if change.previous_filename:
+                stale.add(change.previous_filename)
+            if change.status != "removed" and change.filename in present:
+                refreshed.append(change.filename)
+
+        if stale:
+            vector_store.delete(where={"file": {"$in": sorted(stale)}})
+        vector_store.delete(where={"type": "structure"})
+
+        self._embed_files(vector_store, repo_url, refreshed, ref, tree_structure)
+        return tree_structure, file_paths
+
+    def setup_repo_context(self, repo_url: str, commit_sha: Optional[str] = None) -> RepoContext:
+        """Index of the default branch at `commit_sha`, or at its current head when not given."""
+        # Agents are shared across a worker's threads, so this is approximate
+        # when several repositories are indexed at the same time.
+        stats_before = self.embeddings.snapshot()
+        # A copy, since in-memory contexts are shared by every review of the same commit.
+        repo_context = replace(
+            self._setup_repo_context(repo_url, commit_sha),
+            index_stats=self.embeddings.snapshot().since(stats_before),
+        )
+        stats = repo_context.index_stats
+        print(
+            f"Indexed {repo_url}: {stats['chunks']} chunks ({stats['cached_chunks']} cached, "
+            f"{stats['embedded_chunks']} embedded) in {stats['batches']} batches, "
+            f"{stats['bytes']} bytes, {stats['seconds']}s"
+        )
+        return repo_context
+
+    def _setup_repo_context(self, repo_url: str, commit_sha: Optional[str] = None) -> RepoContext:
+        commit_sha = commit_sha or self.github_client.get_branch_head_sha(repo_url)
+        if self.repo_index is None:
+            return self._setup_memory_context(repo_url, commit_sha)
+
+        entry = self.repo_index.get(repo_url, commit_sha)
+        vector_store = self.repo_index.open(entry) if entry is not None else None
+        if vector_store is None:
+            # Start from the last indexed commit when the delta to head is known.
+            base = self.repo_index.latest(repo_url)
+            changes = None
+            if base is not None:
+                changes = self.github_client.get_changed_files(repo_url, base.commit_sha, commit_sha)
+                if changes is None:
+                    base = None
+
+            def populate(vector_store: Chroma, copied_base: Optional[RepoIndexEntry]) -> Tuple[str, List[str]]:
+                if copied_base is None:
+                    return self._index_repo(vector_store, repo_url, commit_sha)
+                return self._update_index(vector_store, repo_url, commit_sha, changes)
+
+            entry = self.repo_index.build(repo_url, commit_sha, populate, base=base)
+            vector_store = self.repo_index.open(entry)
+            if vector_store is None:
+                raise RuntimeError(f"Index of {repo_url}@{commit_sha} was evicted right after it was built")
+
+        self.vector_store = vector_store
+        return RepoContext(
+            repo_url=repo_url,
+            files=entry.files,
+            tree_structure=entry.tree_structure,
+            commit_sha=commit_sha,
+            vector_store=self.vector_store,
+        )
 
-    def review_changes(self, pr_details: PRDetails, repo_context: RepoContext) -> str:
-        file_review_template = """
-You are an expert code reviewer analyzing ONE changed file.
+    def _setup_memory_context(self, repo_url: str, commit_sha: str) -> RepoContext:
+        """In-memory collection per (repo, commit), used when no index directory is configured."""
+        key = (repo_key(repo_url), commit_sha)
+        with self._memory_indexes_lock:
+            repo_context = self._memory_indexes.get(key)
+            if repo_context is not None:
+                self._memory_indexes.move_to_end(key)
+                self.vector_store = repo_context.vector_store
+                return repo_context
+
+        digest = hashlib.sha1(f"{key[0]}@{commit_sha}".encode("utf-8")).hexdigest()[:16]
+        vector_store = Chroma(collection_name=f"repo-{digest}", embedding_function=self.embeddings)
+        # Drop whatever a previous, interrupted run left in the collection.
+        vector_store.reset_collection()
+        tree_structure, file_paths = self._index_repo(vector_store, repo_url, commit_sha)
+        repo_context = RepoContext(
+            repo_url=repo_url,
+            files=file_paths,
+            tree_structure=tree_structure,
+            commit_sha=commit_sha,
+            vector_store=vector_store,
+        )
 
-Repository structure:
-{repo_structure}
+        evicted = []
+        with self._memory_indexes_lock:
+            self._memory_indexes[key] = repo_context
+            while len(self._memory_indexes) > self.max_open_indexes:
+                evicted.append(self._memory_indexes.popitem(last=False)[1])
+        for old_context in evicted:
+            old_context.vector_store.delete_collection()
+        self.vector_store = vector_store
+        return repo_context
+
+    def _invoke_llm(self, prompt):
+        return with_backoff(lambda: self.llm.invoke(prompt), self.llm_max_retries, self.llm_retry_base_delay)
+
+    def _relevant_context(self, vector_store: Chroma, file: PRFile, repo_context: RepoContext) -> str:
+        with timed("review.retrieve"):
+            results = vector_store.similarity_search(
+                file.filename,
+                k=6,
+                filter={"$and": [{"type": "content"}, {"repo": repo_key(repo_context.repo_url)}]},
+            )
+        return "\n".join([doc.page_content for doc in results])
+
+    def _run_review_prompt(
+        self, final_prompt, filename: str
+    ) -> Tuple[List[Dict], bool]:
+        """Issues from one review prompt, and whether the model response could be parsed."""
+        cache_key = None
+        if self.review_cache is not None:
+            cache_key = ReviewCache.make_key(self.chat_model, LLM_GENERATION_PARAMS, final_prompt.to_string())
+            cached_issues = self.review_cache.get(cache_key)
+            REVIEW_CACHE_LOOKUPS.labels("miss" if cached_issues is None else "hit").inc()
+            if cached_issues is not None:
+                return cached_issues, True
+
+        with timed("review.llm"):
+            review = self._invoke_llm(final_prompt)
+        record_llm_call("review", review)
+        with timed("review.parse"):
+            parsed = self.parse_or_repair_review_response(self._coerce_llm_text(review))
+        file_issues = parsed.get("files", []) if isinstance(parsed, dict) else []
 
-Related repository context:
-{relevant_context}
+        issues = []
+        for issue in file_issues:
+            if not isinstance(issue, dict):
+                continue
+            if not issue.get("filename"):
+                issue["filename"] = filename
+            issues.append(issue)
+
+        # Unparseable responses are not cached so the next push gets a fresh attempt.
+        parsed_ok = "parse_error" not in parsed
+        if cache_key is not None and parsed_ok:
+            self.review_cache.set(cache_key, issues)
+        return issues, parsed_ok
+
+    def _review_file(self, file: PRFile, repo_context: RepoContext, relevant_context: str) -> Tuple[List[Dict], bool]:
+        """Issues for one file reviewed whole, and whether the model response could be parsed."""
+        final_prompt = FILE_REVIEW_PROMPT.invoke({
+            "repo_structure": repo_context.tree_structure,
+            "relevant_context": relevant_context,
+            "filename": file.filename,
+            "file_status": file.status,
+            "file_additions": file.additions,
+            "file_deletions": file.deletions,
+            "file_patch": file.patch or "(no patch available)",
+            "file_content": file.content or "(file content unavailable)",
+        })
+        return self._run_review_prompt(final_prompt, file.filename)
+
+    def _review_hunk_window(
+        self, file: PRFile, window: HunkWindow, window_index: int, window_count: int, relevant_context: str
+    ) -> Tuple[List[Dict], bool]:
+        """Issues in one region of a large file; the prompt asks for file line numbers."""
+        final_prompt = HUNK_REVIEW_PROMPT.invoke({
+            "relevant_context": relevant_context,
+            "filename": file.filename,
+            "file_status": file.status,
+            "window_index": window_index + 1,
+            "window_count": window_count,
+            "window_start": window.start,
+            "window_end": window.end,
+            "hunk_patch": window.patch or "(no patch available)",
+            "window_content": window.render(file.content),
+        })
+        return self._run_review_prompt(final_prompt, file.filename)
+
+    def _hunk_windows(self, file: PRFile) -> Optional[List[HunkWindow]]:
+        """Regions to review a large file by, or None when it is reviewed whole."""
+        if not self.large_file_lines:
+            return None
+        content_lines = len(file.content.splitlines()) if file.content else 0
+        patch_lines = len(file.patch.splitlines()) if file.patch else 0
+        if max(content_lines, patch_lines) <= self.large_file_lines:
+            return None
+        hunks = parse_hunks(file.patch)
+        if hunks:
+            return hunk_windows(hunks, self.hunk_context_lines, content_lines or None, self.large_file_lines)
+        # GitHub leaves out the patch of very large diffs; review the content in slices instead.
+        return content_windows(content_lines, self.large_file_lines) or None
 
-Changed file: {filename}
-File status: {file_status}
-Additions: {file_additions}
-Deletions: {file_deletions}
+    @staticmethod
+    def _merge_file_results(results: List[Tuple[List[Dict], bool]]) -> Tuple[List[Dict], bool]:
+        """Issues of a file's review units in unit order, without repeats from overlapping context."""
+        issues = []
+        seen = set()
+        for unit_issues, _ in results:
+            for issue in unit_issues:
+                key = (
+                    str(issue.get("line_number_of_issue", "")),
+                    str(issue.get("issue_description", "")).strip().lower(),
+                )
+                if key in seen:
+                    continue
+                seen.add(key)
+                issues.append(issue)
+        return issues, all(parsed_ok for _, parsed_ok in results)
 
-PR patch for this file:
-{file_patch}
+    @staticmethod
+    def pending_files(pr_details: PRDetails, known_reviews: Optional[Dict[str, List[Dict]]] = None) -> List[PRFile]:
+        """Files whose current patch has no stored review; files rejected by the file filter are never reviewed."""
+        known_reviews = known_reviews or {}
+        return [
+            file
+            for file in pr_details.files
+            if file.skip_reason is None and file_patch_hash(file) not in known_reviews
+        ]
+
+    def review_changes(
+        self,
+        pr_details: PRDetails,
+        repo_context: Optional[RepoContext],
+        known_reviews: Optional[Dict[str, List[Dict]]] = None,
+        on_file_reviewed: Optional[Callable[[PRFile, List[Dict], bool], None]] = None,
+    ) -> str:
+        """
+        Review every file of the PR and return the aggregated JSON.
 
-Current file content at PR head:
-{file_content}
+        `known_reviews` maps file_patch_hash() to issues from an earlier run;
+        those files are merged in without calling the LLM. `on_file_reviewed`
+        is called (from worker threads) as soon as each remaining file is done,
+        with its issues and whether the model response could be parsed.
 
-Find as many real issues as possible in this file's changed behavior. Do not stop at the first issue.
-Focus on correctness bugs, edge cases, logic errors, unsafe behavior, and maintainability concerns.
+        Files longer than `large_file_lines` (content or patch) are reviewed
+        per hunk window: each group of nearby hunks with up to
+        `hunk_context_lines` of surrounding code, no window exceeding
+        `large_file_lines`, in parallel, and the issues are merged back per file.
 
-Return ONLY valid JSON (no prose, no markdown) with this shape:
-{{
-  "files": [
-    {{
-      "filename": "string",
-      "issue_type": "string",
-      "line_number_of_issue": 0,
-      "issue_description": "string",
-      "suggestions": "string"
-    }}
-  ],
-  "summary": {{
-    "total_files_changed": 1,
-    "total_issues": 0,
-    "critical_issues": 0
-  }}
-}}
+        A file or window whose review raises is retried up to
+        `file_max_retries` times. Files that still fail do not stop the others; once every file has been
+        attempted they are raised together as FileReviewError.
         """
-
-        prompt = ChatPromptTemplate.from_template(file_review_template)
-
-        if self.vector_store is None:
+        known_reviews = known_reviews or {}
+        files = pr_details.files
+        pending = self.pending_files(pr_details, known_reviews)
+
+        vector_store = None
+        if repo_context is not None:
+            vector_store = repo_context.vector_store or self.vector_store
+        if pending and vector_store is None:
             raise RuntimeError("Repository context is not initialized")
-        vector_store = self.vector_store
+
+        # Large files are split into hunk windows. Whole files and windows go
+        # through one pool, so window reviews never wait on a nested executor.
+        units: List[Tuple[int, Optional[HunkWindow], int]] = []
+        unit_counts: List[int] = []
+        for file_index, file in enumerate(pending):
+            windows = self._hunk_windows(file)
+            if windows is None:
+                units.append((file_index, None, 0))
+                unit_counts.append(1)
+            else:
+                units.extend((file_index, window, window_index) for window_index, window in enumerate(windows))
+                unit_counts.append(len(windows))
+
+        # Lifetime counters of the shared cache, diffed below to report this review only.
+        cache_stats_before = self.review_cache.stats() if self.review_cache is not None else None
+
+        state_lock = threading.Lock()
+        unit_results: List[List[Optional[Tuple[List[Dict], bool]]]] = [[None] * count for count in unit_counts]
+        remaining = list(unit_counts)
+        reviewed: Dict[int, List[Dict]] = {}
+        failures: Dict[str, Exception] = {}
+        context_locks = [threading.Lock() for _ in pending]
+        contexts: Dict[int, str] = {}
+
+        def relevant_context(file_index: int) -> str:
+            # Retrieved once per file, however many windows it has.
+            with context_locks[file_index]:
+                if file_index not in contexts:
+                    contexts[file_index] = self._relevant_context(vector_store, pending[file_index], repo_context)
+                return contexts[file_index]
+
+        def review(unit: Tuple[int, Optional[HunkWindow], int]) -> None:
+            file_index, window, window_index = unit
+            file = pending[file_index]
+
+            def attempt() -> Tuple[List[Dict], bool]:
+                context = relevant_context(file_index)
+                if window is None:
+                    return self._review_file(file, repo_context, context)
+                return self._review_hunk_window(file, window, window_index, unit_counts[file_index], context)
+
+            try:
+                # Any error is retried here; rate limits were already retried inside _invoke_llm.
+                outcome = with_backoff(
+                    attempt, self.file_max_retries, self.llm_retry_base_delay, should_retry=lambda e: True
+                )
+            except Exception as e:
+                print(f"Review of {file.filename} failed after {self.file_max_retries + 1} attempts: {e}")
+                with state_lock:
+                    failures[file.filename] = e
+                return
+
+            with state_lock:
+                unit_results[file_index][window_index] = outcome
+                remaining[file_index] -= 1
+                file_done = remaining[file_index] == 0 and file.filename not in failures
+            if not file_done:
+                return
+            issues, parsed_ok = self._merge_file_results(unit_results[file_index])
+            reviewed[file_index] = issues
+            if on_file_reviewed is not None:
+                on_file_reviewed(file, issues, parsed_ok)
+
+        if self.review_concurrency > 1 and len(units) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.review_concurrency, len(units))) as executor:
+                list(executor.map(review, units))
+        else:
+            for unit in units:
+                review(unit)
+
+        if cache_stats_before is not None:
+            stats = self.review_cache.stats()
+            print(
+                f"Review cache: {stats['hits'] - cache_stats_before['hits']} hits, "
+                f"{stats['misses'] - cache_stats_before['misses']} misses"
+            )
+        if failures:
+            raise FileReviewError(failures)
+
+        # Keyed by position in `pending`, so aggregation stays deterministic.
+        reviewed_by_hash = {file_patch_hash(file): reviewed[file_index] for file_index, file in enumerate(pending)}
+        per_file_issues = []
+        for file in files:
+            patch_hash = file_patch_hash(file)
+            if file.skip_reason is not None:
+                continue
+            if patch_hash in reviewed_by_hash:
+                per_file_issues.append(reviewed_by_hash[patch_hash])
+            else:
+                per_file_issues.append([dict(issue) for issue in known_reviews[patch_hash]])
 
         all_issues = []
         critical_issues = 0
-
-        for file in pr_details.files:
-            results = vector_store.similarity_search(file.filename, k=6, filter={"type": "content"})
-            relevant_context = "\n".join([doc.page_content for doc in results])
-
-            final_prompt = prompt.invoke({
-                "repo_structure": repo_context.tree_structure,
-                "relevant_context": relevant_context,
-                "filename": file.filename,
-                "file_status": file.status,
-                "file_additions": file.additions,
-                "file_deletions": file.deletions,
-                "file_patch": file.patch or "(no patch available)",
-                "file_content": file.content or "(file content unavailable)",
-            })
-
-            review = self.llm.invoke(final_prompt)
-            parsed = self.parse_or_repair_review_response(self._coerce_llm_text(review))
-            file_issues = parsed.get("files", []) if isinstance(parsed, dict) else []
-
+        for file_issues in per_file_issues:
             for issue in file_issues:
-                if not isinstance(issue, dict):
-                    continue
-                if not issue.get("filename"):
-                    issue["filename"] = file.filename
                 issue_type = str(issue.get("issue_type", "")).lower()
                 if "critical" in issue_type or "security" in issue_type:
                     critical_issues += 1
@@ -296,7 +734,9 @@ Return ONLY valid JSON (no prose, no markdown) with this shape:
             f"Input:\n{review}"
         )
 
-        repaired_review = self.llm.invoke(repair_prompt)
+        with timed("review.repair"):
+            repaired_review = self._invoke_llm(repair_prompt)
+        record_llm_call("repair", repaired_review)
         repaired_text = repaired_review
         if hasattr(repaired_review, "content"):
             repaired_text = repaired_review.content
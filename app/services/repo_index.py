@@ -0,0 +1,345 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import IO, Callable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+
+MANIFEST_FILENAME = "manifest.json"
+COLLECTION_NAME = "repo_context"
+
+# Bumped when stored documents change shape; older indexes are rebuilt and aged out.
+# 2: every document carries a "repo" metadata field.
+INDEX_FORMAT_VERSION = 2
+
+
+def repo_key(repo_url: str) -> str:
+    """Canonical repository identifier, also stored as the "repo" metadata of every document."""
+    path = urlparse(repo_url).path.strip("/").lower()
+    if path.endswith(".git"):
+        path = path[:-4]
+    return path
+
+
+@dataclass
+class RepoIndexEntry:
+    repo_url: str
+    commit_sha: str
+    path: str
+    tree_structure: str
+    files: List[str]
+    created_at: float
+
+
+class RepoIndexStore:
+    """
+    On-disk Chroma indexes keyed by (repo, commit SHA).
+
+    Each published index is immutable: it is built under an exclusive file lock
+    and only becomes visible once its manifest is written. Processes hold a
+    shared lock on every index they have open, and eviction only removes an
+    index when it can take the exclusive lock without waiting, so an index in
+    use by any worker is never deleted. Entries are evicted by age (last use)
+    and by total size on disk, on a background thread after each build. At
+    most `max_open` indexes are kept open per process.
+    """
+
+    def __init__(self, root_dir: str, embeddings: Embeddings, max_age_seconds: int, max_bytes: int, max_open: int = 8):
+        self.root_dir = root_dir
+        self.embeddings = embeddings
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.max_open = max_open
+        # Open vector stores, each with the lock file holding its shared lock.
+        self._handles: "OrderedDict[str, Tuple[Chroma, IO]]" = OrderedDict()
+        self._handles_lock = threading.Lock()
+        self._evicting = threading.Lock()
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def _repo_dir(self, repo_url: str) -> str:
+        key = repo_key(repo_url)
+        slug = "".join(char if char.isalnum() or char in "-_." else "_" for char in key)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.root_dir, f"{slug}-{digest}")
+
+    def _index_dir(self, repo_url: str, commit_sha: str) -> str:
+        return os.path.join(self._repo_dir(repo_url), commit_sha)
+
+    @staticmethod
+    def _lock_path(index_dir: str) -> str:
+        return f"{index_dir}.lock"
+
+    def _lock(self, index_dir: str, shared: bool = False, blocking: bool = True) -> Optional[IO]:
+        """
+        Open the index's lock file and flock it; None if `blocking` is False and
+        the lock is held elsewhere. Lock files are never deleted: a process could
+        otherwise lock a file that another one has already unlinked and replaced.
+        """
+        os.makedirs(os.path.dirname(index_dir), exist_ok=True)
+        lock_file = open(self._lock_path(index_dir), "a")
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file, flags)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        except BaseException:
+            lock_file.close()
+            raise
+        return lock_file
+
+    @contextmanager
+    def _locked(self, index_dir: str, shared: bool = False, blocking: bool = True) -> Iterator[bool]:
+        lock_file = self._lock(index_dir, shared=shared, blocking=blocking)
+        if lock_file is None:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            # Closing the file releases the lock.
+            lock_file.close()
+
+    @staticmethod
+    def _read_manifest(index_dir: str) -> Optional[RepoIndexEntry]:
+        manifest_path = os.path.join(index_dir, MANIFEST_FILENAME)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("format") != INDEX_FORMAT_VERSION:
+            return None
+        return RepoIndexEntry(
+            repo_url=manifest["repo_url"],
+            commit_sha=manifest["commit_sha"],
+            path=index_dir,
+            tree_structure=manifest["tree_structure"],
+            files=manifest["files"],
+            created_at=manifest["created_at"],
+        )
+
+    @staticmethod
+    def _write_manifest(entry: RepoIndexEntry) -> None:
+        manifest_path = os.path.join(entry.path, MANIFEST_FILENAME)
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump({
+                "format": INDEX_FORMAT_VERSION,
+                "repo_url": entry.repo_url,
+                "commit_sha": entry.commit_sha,
+                "tree_structure": entry.tree_structure,
+                "files": entry.files,
+                "created_at": entry.created_at,
+            }, manifest_file)
+        os.replace(tmp_path, manifest_path)
+
+    @staticmethod
+    def _touch(entry: RepoIndexEntry) -> None:
+        try:
+            os.utime(os.path.join(entry.path, MANIFEST_FILENAME))
+        except OSError:
+            pass
+
+    def get(self, repo_url: str, commit_sha: str) -> Optional[RepoIndexEntry]:
+        entry = self._read_manifest(self._index_dir(repo_url, commit_sha))
+        if entry is not None:
+            self._touch(entry)
+        return entry
+
+    def latest(self, repo_url: str) -> Optional[RepoIndexEntry]:
+        """Most recently built index for the repository, if any."""
+        repo_dir = self._repo_dir(repo_url)
+        if not os.path.isdir(repo_dir):
+            return None
+        latest_entry = None
+        for sha in os.listdir(repo_dir):
+            entry = self._read_manifest(os.path.join(repo_dir, sha))
+            if entry is not None and (latest_entry is None or entry.created_at > latest_entry.created_at):
+                latest_entry = entry
+        return latest_entry
+
+    def open(self, entry: RepoIndexEntry) -> Optional[Chroma]:
+        """
+        Vector store for a published index, reusing the handle if it is already open.
+
+        The index stays share-locked while its handle is open. Returns None if
+        the index was evicted before the lock was taken.
+        """
+        with self._handles_lock:
+            handle = self._handles.get(entry.path)
+            if handle is not None:
+                self._handles.move_to_end(entry.path)
+                return handle[0]
+
+        # Taken outside _handles_lock: it waits while another worker builds or removes the index.
+        lock_file = self._lock(entry.path, shared=True)
+        if not os.path.isfile(os.path.join(entry.path, MANIFEST_FILENAME)):
+            lock_file.close()
+            return None
+        with self._handles_lock:
+            handle = self._handles.get(entry.path)
+            if handle is not None:
+                lock_file.close()
+                self._handles.move_to_end(entry.path)
+                return handle[0]
+            vector_store = Chroma(
+                collection_name=COLLECTION_NAME,
+                embedding_function=self.embeddings,
+                persist_directory=entry.path,
+            )
+            self._handles[entry.path] = (vector_store, lock_file)
+            while len(self._handles) > self.max_open:
+                _, (_, closed_lock) = self._handles.popitem(last=False)
+                closed_lock.close()
+            return vector_store
+
+    def build(
+        self,
+        repo_url: str,
+        commit_sha: str,
+        populate: Callable[[Chroma, Optional[RepoIndexEntry]], Tuple[str, List[str]]],
+        base: Optional[RepoIndexEntry] = None,
+    ) -> RepoIndexEntry:
+        """
+        Build and publish the index for a commit unless another worker already did.
+
+        When `base` is given the new index starts as a copy of it and `populate`
+        only has to apply the delta between the two commits. `populate` receives
+        the base actually copied, or None if it disappeared and a full build is needed.
+        """
+        index_dir = self._index_dir(repo_url, commit_sha)
+        with self._locked(index_dir):
+            entry = self._read_manifest(index_dir)
+            if entry is not None:
+                self._touch(entry)
+                return entry
+
+            # A directory without a manifest is a leftover from a crashed build.
+            shutil.rmtree(index_dir, ignore_errors=True)
+            if base is not None and not self._copy_index(base, index_dir):
+                base = None
+            if base is None:
+                os.makedirs(index_dir)
+            vector_store = Chroma(
+                collection_name=COLLECTION_NAME,
+                embedding_function=self.embeddings,
+                persist_directory=index_dir,
+            )
+            tree_structure, files = populate(vector_store, base)
+            del vector_store
+            self._compact(index_dir)
+
+            entry = RepoIndexEntry(
+                repo_url=repo_url,
+                commit_sha=commit_sha,
+                path=index_dir,
+                tree_structure=tree_structure,
+                files=files,
+                created_at=time.time(),
+            )
+            self._write_manifest(entry)
+
+        self._evict_in_background(keep=index_dir)
+        return entry
+
+    @staticmethod
+    def _compact(index_dir: str) -> None:
+        # Incremental builds start from a copy of the base, including the pages
+        # freed by deleting stale documents; reclaim them before publishing.
+        database_path = os.path.join(index_dir, "chroma.sqlite3")
+        if not os.path.isfile(database_path):
+            return
+        try:
+            connection = sqlite3.connect(database_path, timeout=30)
+            try:
+                connection.execute("VACUUM")
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            print(f"Could not compact index {index_dir}: {e}")
+
+    def _evict_in_background(self, keep: Optional[str] = None) -> None:
+        def run():
+            # One pass at a time per process; skipped passes are picked up by the next build.
+            if not self._evicting.acquire(blocking=False):
+                return
+            try:
+                self.evict(keep=keep)
+            except Exception as e:
+                print(f"Index eviction failed: {e}")
+            finally:
+                self._evicting.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _copy_index(self, base: RepoIndexEntry, index_dir: str) -> bool:
+        # Holding a shared lock on the base keeps eviction from deleting it mid-copy.
+        with self._locked(base.path, shared=True):
+            if not os.path.isfile(os.path.join(base.path, MANIFEST_FILENAME)):
+                return False
+            shutil.copytree(base.path, index_dir, ignore=shutil.ignore_patterns(MANIFEST_FILENAME))
+        return True
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    pass
+        return total
+
+    def _published_indexes(self) -> List[Tuple[str, float, int]]:
+        indexes = []
+        for repo_name in os.listdir(self.root_dir):
+            repo_dir = os.path.join(self.root_dir, repo_name)
+            if not os.path.isdir(repo_dir):
+                continue
+            for sha in os.listdir(repo_dir):
+                index_dir = os.path.join(repo_dir, sha)
+                manifest_path = os.path.join(index_dir, MANIFEST_FILENAME)
+                if not os.path.isfile(manifest_path):
+                    continue
+                last_used = os.path.getmtime(manifest_path)
+                indexes.append((index_dir, last_used, self._dir_size(index_dir)))
+        return indexes
+
+    def _remove(self, index_dir: str) -> bool:
+        # Fails while any process, this one included, has the index open or is copying it.
+        with self._locked(index_dir, blocking=False) as acquired:
+            if not acquired:
+                return False
+            shutil.rmtree(index_dir, ignore_errors=True)
+        return True
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Drop indexes unused for longer than max_age_seconds, then least recently used ones over max_bytes."""
+        now = time.time()
+        remaining = []
+        for index_dir, last_used, size in sorted(self._published_indexes(), key=lambda item: item[1]):
+            if index_dir != keep and now - last_used > self.max_age_seconds and self._remove(index_dir):
+                continue
+            remaining.append((index_dir, size))
+
+        total = sum(size for _, size in remaining)
+        for index_dir, size in remaining:
+            if total <= self.max_bytes:
+                break
+            if index_dir != keep and self._remove(index_dir):
+                total -= size
@@ -0,0 +1,57 @@
+import json
+import zlib
+from typing import Dict, Optional
+from redis import Redis
+from redis import asyncio as aioredis
+
+
+RESULT_KEY_PREFIX = "review-result"
+
+
+def result_key(task_id: str) -> str:
+    return f"{RESULT_KEY_PREFIX}:{task_id}"
+
+
+def encode_result(result: Dict) -> bytes:
+    return zlib.compress(json.dumps(result, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_result(raw: bytes) -> Dict:
+    return json.loads(zlib.decompress(raw))
+
+
+def cache_result(cache_client: Redis, task_id: str, result: Dict, ttl_seconds: int, max_bytes: int) -> bool:
+    """
+    Keep a compressed copy of a fresh result for `ttl_seconds`, so clients
+    polling for it right after completion are not all sent to Postgres.
+
+    Results larger than `max_bytes` once compressed are not cached, and neither
+    are results that fail to encode or to reach Redis (the error is printed).
+    /results then reads them from Postgres. Returns whether the result was cached.
+    """
+    try:
+        value = encode_result(result)
+        if len(value) > max_bytes:
+            return False
+        cache_client.set(result_key(task_id), value, ex=ttl_seconds)
+    except Exception as e:
+        print(f"Error caching result of {task_id}: {e}")
+        return False
+    return True
+
+
+async def get_cached_result(redis_client: aioredis.Redis, task_id: str) -> Optional[Dict]:
+    raw = await redis_client.get(result_key(task_id))
+    return decode_result(raw) if raw is not None else None
+
+
+def result_reference(task_id: str, result: Dict) -> Dict:
+    """What the task returns to Celery: identifies the stored result without repeating it."""
+    return {
+        "task_id": task_id,
+        "repo_url": result.get("repo_url"),
+        "pr_number": result.get("pr_number"),
+        "head_sha": result.get("head_sha"),
+        "summary": result.get("pr_review", {}).get("summary", {}),
+        "result_path": f"/results/{task_id}",
+    }
@@ -0,0 +1,49 @@
+import random
+import time
+from typing import Callable, Optional, TypeVar
+
+from github import GithubException, RateLimitExceededException
+
+
+T = TypeVar("T")
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """Whether `exc` is a rate-limit or quota rejection from GitHub or the Gemini APIs."""
+    if isinstance(exc, RateLimitExceededException):
+        return True
+    if isinstance(exc, GithubException):
+        return exc.status == 429 or (exc.status == 403 and "rate limit" in str(exc.data).lower())
+    if getattr(exc, "code", None) == 429 or getattr(exc, "status_code", None) == 429:
+        return True
+    message = f"{type(exc).__name__} {exc}".lower()
+    return "resourceexhausted" in message or "429" in message or "rate limit" in message or "quota" in message
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """The server's Retry-After, in seconds, when the error carries one (as PyGithub errors do)."""
+    value = (getattr(exc, "headers", None) or {}).get("retry-after")
+    return float(value) if value and value.isdigit() else None
+
+
+def with_backoff(
+    call: Callable[[], T],
+    max_retries: int,
+    base_delay: float,
+    should_retry: Callable[[Exception], bool] = is_rate_limit_error,
+) -> T:
+    """
+    Call `call`, retrying up to `max_retries` times on errors `should_retry`
+    accepts. Waits honour Retry-After when given, and otherwise double from
+    `base_delay` with jitter, so parallel callers do not retry in lockstep.
+    """
+    delay = base_delay
+    for attempt in range(max_retries + 1):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == max_retries or not should_retry(e):
+                raise
+            wait = retry_after_seconds(e)
+            time.sleep(wait if wait is not None else delay * (1 + random.random()))
+            delay *= 2
@@ -0,0 +1,74 @@
+import json
+from typing import AsyncIterator, Optional, Tuple
+from redis import Redis
+from redis import asyncio as aioredis
+
+
+EVENTS_KEY_PREFIX = "review-events"
+
+# Events after which nothing more will be published for the task.
+TERMINAL_EVENTS = ("complete", "error")
+
+
+def events_key(task_id: str) -> str:
+    return f"{EVENTS_KEY_PREFIX}:{task_id}"
+
+
+def publish_event(cache_client: Redis, task_id: str, event: str, data: dict, ttl_seconds: int, maxlen: int) -> None:
+    """
+    Append an event to the task's Redis stream, trimmed to about `maxlen`
+    entries, and refresh its expiry. A Redis error is printed and the event is
+    dropped; subscribers still see the outcome through the task status.
+    """
+    key = events_key(task_id)
+    try:
+        pipeline = cache_client.pipeline(transaction=False)
+        pipeline.xadd(key, {"event": event, "data": json.dumps(data)}, maxlen=maxlen, approximate=True)
+        pipeline.expire(key, ttl_seconds)
+        pipeline.execute()
+    except Exception as e:
+        print(f"Error publishing {event} event for {task_id}: {e}")
+
+
+async def publish_event_async(
+    redis_client: aioredis.Redis, task_id: str, event: str, data: dict, ttl_seconds: int, maxlen: int
+) -> None:
+    """Async variant of publish_event for the API's event loop."""
+    key = events_key(task_id)
+    try:
+        pipeline = redis_client.pipeline(transaction=False)
+        pipeline.xadd(key, {"event": event, "data": json.dumps(data)}, maxlen=maxlen, approximate=True)
+        pipeline.expire(key, ttl_seconds)
+        await pipeline.execute()
+    except Exception as e:
+        print(f"Error publishing {event} event for {task_id}: {e}")
+
+
+async def read_events(
+    redis_client: aioredis.Redis,
+    task_id: str,
+    last_event_id: str = "0",
+    block_ms: int = 15000,
+) -> AsyncIterator[Optional[Tuple[str, str, dict]]]:
+    """
+    Yield (event_id, event, data) from the start of the task's stream (or after
+    `last_event_id`), blocking for new ones. Yields None whenever `block_ms`
+    passes without events so callers can send keep-alives or give up.
+    Stops after a terminal event.
+    """
+    key = events_key(task_id)
+    while True:
+        response = await redis_client.xread({key: last_event_id}, block=block_ms, count=100)
+        if not response:
+            yield None
+            continue
+        for _, entries in response:
+            for entry_id, fields in entries:
+                last_event_id = entry_id.decode("utf-8")
+                event = fields[b"event"].decode("utf-8")
+                data = json.loads(fields[b"data"])
+                yield last_event_id, event, data
+                if event == "error" and data.get("will_retry"):
+                    continue
+                if event in TERMINAL_EVENTS:
+                    return
@@ -0,0 +1,94 @@
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from redis import Redis
+from redis import asyncio as aioredis
+
+
+SMALL_QUEUE = "reviews.small"
+LARGE_QUEUE = "reviews.large"
+REVIEW_QUEUES = (SMALL_QUEUE, LARGE_QUEUE)
+
+LATENCY_KEY_PREFIX = "queue-latency"
+
+
+@dataclass
+class PRSummary:
+    head_sha: str
+    changed_files: int
+    additions: int
+    deletions: int
+    repo_size_kb: int
+
+
+def estimate_review_cost(summary: PRSummary) -> float:
+    """
+    Rough relative cost of reviewing a PR, from data available before any content is fetched.
+
+    One unit is about one file review (one LLM call); large patches add prompt
+    size, and large repositories add indexing work when no index is cached yet.
+    """
+    return (
+        summary.changed_files
+        + (summary.additions + summary.deletions) / 200
+        + summary.repo_size_kb / 50_000
+    )
+
+
+def choose_queue(cost: float, large_cost_threshold: float) -> str:
+    return LARGE_QUEUE if cost >= large_cost_threshold else SMALL_QUEUE
+
+
+def latency_key(queue: str) -> str:
+    return f"{LATENCY_KEY_PREFIX}:{queue}"
+
+
+def record_latency(cache_client: Redis, queue: str, wait_seconds: Optional[float], run_seconds: float, max_samples: int) -> None:
+    """
+    Push a (wait, run) sample onto the queue's list, keeping the newest
+    `max_samples`. Called from task signal handlers, so a Redis error is only
+    printed and the sample is lost.
+    """
+    sample = json.dumps({"wait": wait_seconds, "run": run_seconds})
+    try:
+        pipeline = cache_client.pipeline(transaction=False)
+        pipeline.lpush(latency_key(queue), sample)
+        pipeline.ltrim(latency_key(queue), 0, max_samples - 1)
+        pipeline.execute()
+    except Exception as e:
+        print(f"Error recording latency for {queue}: {e}")
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+def _distribution(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": _percentile(values, 0.5),
+        "p95": _percentile(values, 0.95),
+        "max": round(max(values), 3) if values else None,
+    }
+
+
+async def queue_metrics(redis_client: aioredis.Redis, broker_client: aioredis.Redis) -> Dict[str, Dict]:
+    """Queue depth and latency percentiles (time waiting in queue, running, and end to end) per review queue."""
+    metrics = {}
+    for queue in REVIEW_QUEUES:
+        samples = [json.loads(raw) for raw in await redis_client.lrange(latency_key(queue), 0, -1)]
+        waits = [sample["wait"] for sample in samples if sample["wait"] is not None]
+        runs = [sample["run"] for sample in samples]
+        totals = [sample["wait"] + sample["run"] for sample in samples if sample["wait"] is not None]
+        metrics[queue] = {
+            # The Redis broker keeps each queue as a list under the queue name.
+            "depth": await broker_client.llen(queue),
+            "samples": len(samples),
+            "wait_seconds": _distribution(waits),
+            "run_seconds": _distribution(runs),
+            "total_seconds": _distribution(totals),
+        }
+    return metrics
@@ -0,0 +1,81 @@
+from typing import Optional
+from redis import Redis
+from redis import asyncio as aioredis
+from app.services.task_status import get_task_status, get_task_status_async
+
+
+SUBMISSION_KEY_PREFIX = "analyze-pr"
+
+# Statuses after which a submission may be claimed again by a new task.
+RETRYABLE_STATUSES = ("FAILURE", "REVOKED")
+
+_REPLACE_IF_EQUAL = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+_DELETE_IF_EQUAL = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def submission_key(repo_url: str, pr_number: int, head_sha: str) -> str:
+    return f"{SUBMISSION_KEY_PREFIX}:{repo_url.rstrip('/').lower()}:{pr_number}:{head_sha}"
+
+
+def claim_submission(cache_client: Redis, key: str, task_id: str, ttl_seconds: int) -> Optional[str]:
+    """
+    Atomically claim `key` for `task_id`.
+
+    Returns None if the claim succeeded and the caller should enqueue the task,
+    otherwise the id of the in-flight or completed task that already owns it.
+    A claim held by a failed or revoked task is taken over.
+    """
+    for _ in range(3):
+        if cache_client.set(key, task_id, nx=True, ex=ttl_seconds):
+            return None
+
+        existing = cache_client.get(key)
+        if existing is None:
+            # The previous claim expired between SET NX and GET.
+            continue
+        existing_id = existing.decode("utf-8")
+        if get_task_status(existing_id)["status"] not in RETRYABLE_STATUSES:
+            return existing_id
+        if cache_client.eval(_REPLACE_IF_EQUAL, 1, key, existing_id, task_id, ttl_seconds):
+            return None
+
+    raise RuntimeError(f"Could not claim submission {key}")
+
+
+async def claim_submission_async(cache_client: aioredis.Redis, key: str, task_id: str, ttl_seconds: int) -> Optional[str]:
+    """Async variant of claim_submission for the API's event loop."""
+    for _ in range(3):
+        if await cache_client.set(key, task_id, nx=True, ex=ttl_seconds):
+            return None
+
+        existing = await cache_client.get(key)
+        if existing is None:
+            continue
+        existing_id = existing.decode("utf-8")
+        if (await get_task_status_async(existing_id))["status"] not in RETRYABLE_STATUSES:
+            return existing_id
+        if await cache_client.eval(_REPLACE_IF_EQUAL, 1, key, existing_id, task_id, ttl_seconds):
+            return None
+
+    raise RuntimeError(f"Could not claim submission {key}")
+
+
+def release_submission(cache_client: Redis, key: str, task_id: str) -> None:
+    """Drop a claim that was never enqueued, without touching a claim taken over by someone else."""
+    cache_client.eval(_DELETE_IF_EQUAL, 1, key, task_id)
+
+
+async def release_submission_async(cache_client: aioredis.Redis, key: str, task_id: str) -> None:
+    await cache_client.eval(_DELETE_IF_EQUAL, 1, key, task_id)
@@ -1,11 +1,43 @@
+import json
+from typing import Dict, List
 from celery.result import AsyncResult
+from celery.backends.redis import RedisBackend
+from starlette.concurrency import run_in_threadpool
+from app.config import get_async_redis, get_celery_app, get_settings
 
 def get_task_status(task_id: str) -> dict:
-    task_result = AsyncResult(task_id)
+    task_result = AsyncResult(task_id, app=get_celery_app())
     return {"task_id": task_id, "status": task_result.status}
 
+async def get_task_status_async(task_id: str) -> dict:
+    """Read task state without blocking the event loop; Redis result backends are read directly."""
+    backend = get_celery_app().backend
+    if not isinstance(backend, RedisBackend):
+        return await run_in_threadpool(get_task_status, task_id)
+
+    redis_client = get_async_redis(get_settings().CELERY_RESULT_BACKEND)
+    meta = await redis_client.get(backend.get_key_for_task(task_id))
+    status = json.loads(meta)["status"] if meta else "PENDING"
+    return {"task_id": task_id, "status": status}
+
+async def get_task_statuses_async(task_ids: List[str]) -> Dict[str, str]:
+    """Statuses of many tasks, read from a Redis result backend in one round trip."""
+    if not task_ids:
+        return {}
+    backend = get_celery_app().backend
+    if not isinstance(backend, RedisBackend):
+        statuses = [await run_in_threadpool(get_task_status, task_id) for task_id in task_ids]
+        return {status["task_id"]: status["status"] for status in statuses}
+
+    redis_client = get_async_redis(get_settings().CELERY_RESULT_BACKEND)
+    metas = await redis_client.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+    return {
+        task_id: json.loads(meta)["status"] if meta else "PENDING"
+        for task_id, meta in zip(task_ids, metas)
+    }
+
 def get_task_result(task_id: str) -> dict:
-    task_result = AsyncResult(task_id)
+    task_result = AsyncResult(task_id, app=get_celery_app())
     if task_result.status == "SUCCESS":
         return task_result.result
     else:
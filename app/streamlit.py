@@ -2,6 +2,7 @@ import streamlit as st
 import requests
 import pandas as pd
 import os
+import json
 
 # API Base URL (adjust if needed)
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8081")
@@ -27,10 +28,14 @@ with st.form("analyze_pr_form"):
             response = requests.post(f"{API_BASE_URL}/analyze-pr", json=payload)
             if response.status_code == 200:
                 task_id = response.json().get("task_id")
-                st.success(f"Task submitted successfully. Task ID: {task_id}")
+                if response.json().get("deduplicated"):
+                    st.info(f"This PR head is already being reviewed. Task ID: {task_id}")
+                else:
+                    st.success(f"Task submitted successfully. Task ID: {task_id}")
 
                 # Add task to the session state
-                st.session_state.tasks.append({"Task ID": task_id, "Status": "Pending"})
+                if all(task["Task ID"] != task_id for task in st.session_state.tasks):
+                    st.session_state.tasks.append({"Task ID": task_id, "Status": "Pending"})
             else:
                 st.error(f"Error: {response.json().get('detail', 'Unknown error')}")
         except requests.exceptions.RequestException as e:
@@ -61,6 +66,40 @@ if st.session_state.tasks:
 else:
     st.info("No tasks added yet.")
 
+# Tab for Watching a Task Live
+with st.form("watch_task_form"):
+    st.subheader("Watch Task")
+    watch_task_id = st.text_input("Task ID", key="watch_task_id", help="Stream per-file results as they are produced.")
+
+    watch_submitted = st.form_submit_button("Watch")
+    if watch_submitted:
+        progress_bar = st.progress(0.0)
+        status_text = st.empty()
+        try:
+            # Server-sent events from /stream/{task_id}; one connection instead of repeated polling.
+            with requests.get(f"{API_BASE_URL}/stream/{watch_task_id}", stream=True, timeout=(10, None)) as response:
+                event = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event: "):
+                        event = line[len("event: "):]
+                    elif line.startswith("data: "):
+                        data = json.loads(line[len("data: "):])
+                        if event == "started":
+                            status_text.text(f"Reviewing {data['pending_files']} of {data['total_files']} files")
+                        elif event == "indexing":
+                            status_text.text("Indexing repository context")
+                        elif event == "file":
+                            progress_bar.progress(data["done"] / max(data["total"], 1))
+                            with st.expander(f"{data['filename']} ({len(data['issues'])} issues)"):
+                                st.json(data["issues"])
+                        elif event == "error" and data.get("will_retry"):
+                            status_text.text(f"Retrying after error: {data.get('message')}")
+                        elif event in ("complete", "error"):
+                            status_text.text(f"Task {event}: {data}")
+                            break
+        except requests.exceptions.RequestException as e:
+            st.error(f"Error: {str(e)}")
+
 # Tab for Retrieving Task Results
 with st.form("get_results_form"):
     st.subheader("Retrieve Task Results")
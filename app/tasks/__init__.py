@@ -1 +1 @@
-from .analyze import full_review_workflow_task
\ No newline at end of file
+from .analyze import full_review_workflow_task, batch_review_task
\ No newline at end of file
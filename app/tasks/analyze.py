@@ -1,42 +1,304 @@
-from celery.signals import task_success
+from typing import List, Optional
+from uuid import uuid4
+from celery import group
+from celery.signals import (
+    task_postrun, task_prerun, task_success, worker_init, worker_process_init, worker_process_shutdown,
+)
 from app.config import get_code_review_agent, get_github_service, get_celery_app, get_cache_client
-from app.db import save_analysis
-import json
+from app.config import init_dependencies, close_dependencies, get_settings
+from app.db import save_analysis, get_file_reviews, save_file_review
+from app.db.database import engine
+from app.services.github_integration import PRFile
+from app.services.pr_analysis import file_patch_hash
+from app.services.review_events import events_key, publish_event
+from app.services.submission import submission_key, claim_submission, release_submission
+from app.services.batches import save_batch
+from app.services.checkpoints import ReviewCheckpoint
+from app.services.result_cache import cache_result, result_reference
+from app.services.routing import choose_queue, estimate_review_cost, record_latency
+from app.services.metrics import clear_multiprocess_dir, collect_timings, mark_process_dead, start_metrics_server, timed
+import threading
+import time
 
 celery_app = get_celery_app()
 
+MAX_RETRIES = 3
+
+
+@worker_init.connect
+def start_worker_metrics(**kwargs):
+    # Runs once in the main worker process; its exporter aggregates the pool processes' samples.
+    port = get_settings().WORKER_METRICS_PORT
+    if port:
+        clear_multiprocess_dir()
+        start_metrics_server(port)
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # Pooled DB connections inherited from the parent must not be reused after fork.
+    engine.dispose(close=False)
+    init_dependencies()
+    try:
+        get_github_service()
+        get_code_review_agent()
+    except Exception as e:
+        print(f"Could not pre-build review clients: {e}")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(pid=None, **kwargs):
+    close_dependencies()
+    if pid is not None:
+        mark_process_dead(pid)
+
+
+# task_id -> (wall clock, monotonic) start of the tasks this process is running.
+_task_started = {}
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, **kwargs):
+    _task_started[task_id] = (time.time(), time.monotonic())
+
+
+@task_postrun.connect
+def record_task_latency(task_id=None, task=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is None or task is None:
+        return
+    started_at, started_monotonic = started
+    # Set by the publisher at enqueue time; tasks sent without it only report run time.
+    enqueued_at = getattr(task.request, "enqueued_at", None)
+    wait_seconds = started_at - enqueued_at if isinstance(enqueued_at, (int, float)) else None
+    queue = (task.request.delivery_info or {}).get("routing_key") or celery_app.conf.task_default_queue
+    record_latency(
+        get_cache_client(), queue, wait_seconds, time.monotonic() - started_monotonic,
+        max_samples=get_settings().QUEUE_LATENCY_SAMPLES,
+    )
+
+
+def store_result(task_id: str, result: dict, checkpoint: ReviewCheckpoint) -> dict:
+    """
+    Write a finished review once: to Postgres, plus a short-lived compressed copy
+    in Redis for clients polling right after completion. Returns the reference
+    kept by the Celery result backend instead of the full payload.
+
+    Safe to repeat: the insert is skipped when the row already exists, and
+    cache_result never raises, so a retry after a committed insert completes.
+    """
+    settings = get_settings()
+    save_analysis(
+        task_id, result["repo_url"], result["pr_number"], result,
+        head_sha=result.get("head_sha"),
+        compress=settings.ANALYSIS_COMPRESS_RESULTS,
+    )
+    cache_result(
+        get_cache_client(), task_id, result,
+        ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+        max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    )
+    checkpoint.clear()
+    return result_reference(task_id, result)
+
+
 @celery_app.task(bind=True)
 def full_review_workflow_task(self, repo_url: str, pr_number: int):
+    settings = get_settings()
+    task_id = self.request.id
+
+    def publish(event: str, data: dict):
+        publish_event(
+            get_cache_client(), task_id, event, data,
+            ttl_seconds=settings.REVIEW_EVENTS_TTL_SECONDS,
+            maxlen=settings.REVIEW_EVENTS_MAXLEN,
+        )
+
+    # Stages finished by an earlier attempt of this task are loaded instead of redone.
+    checkpoint = ReviewCheckpoint(get_cache_client(), task_id, ttl_seconds=settings.REVIEW_CHECKPOINT_TTL_SECONDS)
+
+    with collect_timings() as timings:
+        try:
+            # Reviewed by an earlier attempt that failed while storing the result.
+            result = checkpoint.load_result()
+            if result is not None:
+                return store_result(task_id, result, checkpoint)
+
+            github_service = get_github_service()
+            code_review_agent = get_code_review_agent()
+
+            # PR details and repositories are fetched once per task; the memo ends with it.
+            with github_service.task_scope():
+                pr_details = checkpoint.load_pr_details()
+                if pr_details is None:
+                    with timed("fetch"):
+                        pr_details = github_service.get_pr_details(repo_url=repo_url, pr_number=pr_number)
+                    checkpoint.save_pr_details(pr_details)
+
+                # Files whose patch was already reviewed on an earlier push are merged from the DB,
+                # and files reviewed by an earlier attempt of this task from the checkpoint.
+                known_reviews = get_file_reviews(repo_url, pr_number)
+                known_reviews.update(checkpoint.load_file_reviews())
+                pending_files = code_review_agent.pending_files(pr_details, known_reviews)
+                total_files = len(pr_details.files)
+                # Retries carry on from the files an earlier attempt already published,
+                # so `done` never passes `total`.
+                reported = checkpoint.load_reported_files()
+                publish("started", {
+                    "total_files": total_files,
+                    "pending_files": len(pending_files),
+                    "done": len(reported),
+                })
+
+                progress_lock = threading.Lock()
+                progress = {"done": len(reported)}
+
+                def report_file(filename: str, issues: list, cached: bool, skipped: str = None):
+                    with progress_lock:
+                        if filename in reported:
+                            return
+                        reported.add(filename)
+                        progress["done"] += 1
+                        done = progress["done"]
+                    checkpoint.save_reported_file(filename)
+                    publish("file", {
+                        "filename": filename,
+                        "issues": issues,
+                        "cached": cached,
+                        "skipped": skipped,
+                        "done": done,
+                        "total": total_files,
+                    })
+
+                for file in pr_details.files:
+                    patch_hash = file_patch_hash(file)
+                    if file.skip_reason is not None:
+                        report_file(file.filename, [], cached=False, skipped=file.skip_reason)
+                    elif patch_hash in known_reviews:
+                        report_file(file.filename, known_reviews[patch_hash], cached=True)
+
+                repo_context = None
+                if pending_files:
+                    publish("indexing", {"repo_url": repo_url})
+                    # Retries stay on the commit indexed first, whose index is already persisted.
+                    with timed("index"):
+                        repo_context = code_review_agent.setup_repo_context(
+                            repo_url, commit_sha=checkpoint.load_index_commit()
+                        )
+                    checkpoint.save_index_commit(repo_context.commit_sha)
+
+                def on_file_reviewed(file: PRFile, issues: list, parsed_ok: bool):
+                    checkpoint.save_file_review(file_patch_hash(file), issues)
+                    if parsed_ok:
+                        save_file_review(repo_url, pr_number, pr_details.head_sha, file.filename, file_patch_hash(file), issues)
+                    report_file(file.filename, issues, cached=False)
+
+                with timed("review"):
+                    review_response = code_review_agent.review_changes(
+                        pr_details=pr_details,
+                        repo_context=repo_context,
+                        known_reviews=known_reviews,
+                        on_file_reviewed=on_file_reviewed,
+                    )
+                with timed("aggregate"):
+                    parsed_review = code_review_agent.parse_or_repair_review_response(review_response)
+
+                result = {
+                    "repo_url": repo_url,
+                    "pr_number": pr_number,
+                    "head_sha": pr_details.head_sha,
+                    "pr_review": parsed_review
+                }
+                if settings.REVIEW_RECORD_TIMINGS:
+                    # Covers this attempt only; stages restored from a checkpoint are not in it.
+                    result["timings"] = timings.as_dict()
+                checkpoint.save_result(result)
+                return store_result(task_id, result, checkpoint)
+        except Exception as e:
+            publish("error", {"message": str(e), "will_retry": self.request.retries < MAX_RETRIES})
+            raise self.retry(exc=e, countdown=60, max_retries=MAX_RETRIES)
+
+
+@celery_app.task(bind=True)
+def batch_review_task(self, repo_url: str, pr_numbers: Optional[List[int]] = None):
+    """
+    Review several PRs of one repository (every open PR when `pr_numbers` is None).
+
+    The repository index is built once here; the per-PR tasks fanned out
+    afterwards find it in the shared index directory instead of rebuilding it.
+    """
+    settings = get_settings()
+    batch_id = self.request.id
+
     try:
         github_service = get_github_service()
         code_review_agent = get_code_review_agent()
 
-        repo_context = code_review_agent.setup_repo_context(repo_url)
-        pr_details = github_service.get_pr_details(repo_url=repo_url, pr_number=pr_number)
-        review_response = code_review_agent.review_changes(pr_details=pr_details, repo_context=repo_context)
-        parsed_review = code_review_agent.parse_or_repair_review_response(review_response)
+        with github_service.task_scope():
+            if pr_numbers is None:
+                pr_numbers = [pr_number for pr_number, _ in github_service.get_open_pull_requests(repo_url)]
+            # Summaries give the head to deduplicate on and the cost to route each review by.
+            pull_requests = [(pr_number, github_service.get_pr_summary(repo_url, pr_number)) for pr_number in pr_numbers]
+            if pull_requests:
+                code_review_agent.setup_repo_context(repo_url)
+    except Exception as e:
+        raise self.retry(exc=e, countdown=60, max_retries=MAX_RETRIES)
 
+    cache_client = get_cache_client()
+    tasks = []
+    signatures = []
+    claimed = []
+    try:
+        for pr_number, pr_summary in pull_requests:
+            # Same dedup as /analyze-pr, so PRs already under review are not reviewed twice.
+            key = submission_key(repo_url, pr_number, pr_summary.head_sha)
+            task_id = str(uuid4())
+            existing_task_id = claim_submission(cache_client, key, task_id, settings.SUBMISSION_TTL_SECONDS)
+            if existing_task_id is not None:
+                tasks.append({"pr_number": pr_number, "task_id": existing_task_id, "deduplicated": True})
+                continue
+            claimed.append((key, task_id))
+            queue = choose_queue(estimate_review_cost(pr_summary), settings.ROUTING_LARGE_COST_THRESHOLD)
+            tasks.append({"pr_number": pr_number, "task_id": task_id, "deduplicated": False, "queue": queue})
+            signatures.append(full_review_workflow_task.si(repo_url, pr_number).set(
+                task_id=task_id, queue=queue, headers={"enqueued_at": time.time()}
+            ))
 
-        return {
-            "repo_url": repo_context.repo_url,
-            "pr_number": pr_number,
-            "pr_review": parsed_review
-        }
-    except Exception as e:
-        raise self.retry(exc=e, countdown=60, max_retries=3)
+        save_batch(cache_client, batch_id, repo_url, tasks, ttl_seconds=settings.SUBMISSION_TTL_SECONDS)
+        # As in /analyze-pr, so /stream accepts these tasks while they wait in the queue.
+        for task in tasks:
+            if not task["deduplicated"]:
+                publish_event(
+                    cache_client, task["task_id"], "queued", {"queue": task["queue"]},
+                    ttl_seconds=settings.REVIEW_EVENTS_TTL_SECONDS,
+                    maxlen=settings.REVIEW_EVENTS_MAXLEN,
+                )
+        if signatures:
+            group(signatures).apply_async()
+    except Exception:
+        # Nothing was enqueued: free every claim made so far, or later submissions
+        # would dedupe to tasks that never run until the claims expire.
+        for key, task_id in claimed:
+            try:
+                cache_client.delete(events_key(task_id))
+                release_submission(cache_client, key, task_id)
+            except Exception as e:
+                print(f"Error releasing submission {key}: {e}")
+        raise
+
+    return {"repo_url": repo_url, "tasks": tasks}
 
 
 @task_success.connect(sender=full_review_workflow_task)
-def save_analysis_on_success(sender, result=None, **kwargs):
+def publish_complete_on_success(sender, result=None, **kwargs):
     if not isinstance(result, dict):
         return
 
-    task_id = sender.request.id.__str__()
-    repo_url = result.get("repo_url")
-    pr_number = result.get("pr_number")
-    if not isinstance(repo_url, str) or not isinstance(pr_number, int):
-        return
-
-    cache_client = get_cache_client()
-    cache_client.set(task_id, json.dumps(result))
-    save_analysis(task_id, repo_url, pr_number, result)
+    # The task stored the full result before returning this reference,
+    # so subscribers can fetch /results right away.
+    settings = get_settings()
+    publish_event(
+        get_cache_client(), sender.request.id.__str__(), "complete", {"summary": result.get("summary", {})},
+        ttl_seconds=settings.REVIEW_EVENTS_TTL_SECONDS,
+        maxlen=settings.REVIEW_EVENTS_MAXLEN,
+    )
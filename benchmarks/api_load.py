@@ -0,0 +1,115 @@
+"""
+Concurrent polling load against a running API.
+
+Run it once against the previous (sync) handlers and once against the current
+ones, then compare the two JSON reports:
+
+    python benchmarks/api_load.py --base-url http://localhost:8081 --task-id <id> \
+        --concurrency 1000 --requests 20000 --label async --output after.json
+    python benchmarks/api_load.py --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(base_url: str, paths: List[str], concurrency: int, total_requests: int, timeout: float) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    next_request = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def worker():
+            nonlocal next_request, errors
+            while next_request < total_requests:
+                path = paths[next_request % len(paths)]
+                next_request += 1
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "wall_seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(_percentile(latencies, 50) * 1000, 2),
+            "p95": round(_percentile(latencies, 95) * 1000, 2),
+            "p99": round(_percentile(latencies, 99) * 1000, 2),
+        },
+    }
+
+
+def compare(before_path: str, after_path: str) -> Dict:
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    return {
+        "before": before.get("label"),
+        "after": after.get("label"),
+        "requests_per_second": [before["requests_per_second"], after["requests_per_second"]],
+        "errors": [before["errors"], after["errors"]],
+        "latency_ms": {
+            key: [before["latency_ms"][key], after["latency_ms"][key]]
+            for key in ("mean", "p50", "p95", "p99")
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Polling load benchmark for /status and /results")
+    parser.add_argument("--base-url", default="http://localhost:8081")
+    parser.add_argument("--task-id", action="append", default=[], help="Task id to poll (repeatable)")
+    parser.add_argument("--endpoint", choices=["status", "results"], default="status")
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        return
+
+    task_ids = args.task_id or ["benchmark-missing-task"]
+    paths = [f"/{args.endpoint}/{task_id}" for task_id in task_ids]
+    report = asyncio.run(run_load(args.base_url, paths, args.concurrency, args.requests, args.timeout))
+    report["label"] = args.label
+    report["endpoint"] = args.endpoint
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Deterministic local stand-ins for GitHub, the Gemini chat model and the Gemini
+embedding model, plus generated repositories and PRs, for offline benchmarks.
+
+Every fake counts its calls and takes a latency (seconds per call) and a
+failure rate. Randomness comes from seeded generators, so the same scenario
+produces the same repository, PR, model output and failure pattern on every run.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.messages import AIMessage
+
+from app.services.file_filter import FileFilter
+from app.services.github_integration import ChangedFile, PRDetails, PRFile, RepoTree, TreeEntry
+from app.services.routing import PRSummary
+
+
+class CallCounter:
+    """Thread-safe call counts per operation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def add(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(sorted(self.counts.items()))
+
+
+class FakeRateLimitError(Exception):
+    """Raised by the fakes to simulate a transient rate-limit response (retried like a real 429)."""
+
+    code = 429
+
+
+class _Knobs:
+    def __init__(self, latency: float, failure_rate: float, seed: int):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self, extra: float = 0.0) -> None:
+        if self.latency or extra:
+            time.sleep(self.latency + extra)
+
+    def fails(self) -> bool:
+        if not self.failure_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+
+# --- Generated repositories -------------------------------------------------
+
+SCALES = {
+    # files in the repository, files changed by the PR, average lines per file
+    "small": (50, 5, 60),
+    "medium": (500, 20, 80),
+    "large": (3000, 60, 100),
+    "monorepo": (20000, 150, 100),
+}
+
+# Shared by many generated files, like license headers and boilerplate in real repositories.
+_BOILERPLATE = [
+    "# Copyright (c) Example Corp. All rights reserved.",
+    "# Licensed under the Apache License, Version 2.0.",
+    "import logging",
+    "import os",
+    "",
+    "logger = logging.getLogger(__name__)",
+    "",
+]
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1("\0".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class GeneratedRepo:
+    """
+    A synthetic repository of `num_files` Python files across nested packages.
+
+    File contents are derived from the path and commit on demand rather than
+    stored, so monorepo-scale repositories cost no memory until they are read.
+    """
+
+    url: str
+    num_files: int
+    lines_per_file: int
+    seed: int = 0
+    commit_sha: str = ""
+
+    def __post_init__(self):
+        if not self.commit_sha:
+            self.commit_sha = _digest("commit", self.url, self.seed)
+        # About 40 files per package, four packages per parent, like a wide monorepo.
+        self.paths = []
+        for index in range(self.num_files):
+            package = index // 40
+            parts = []
+            while True:
+                parts.append(f"pkg{package % 4}")
+                package //= 4
+                if package == 0:
+                    break
+            self.paths.append("/".join(["src", *reversed(parts), f"module_{index}.py"]))
+
+    def content(self, path: str) -> str:
+        rng = random.Random(_digest(self.seed, path))
+        lines = list(_BOILERPLATE)
+        length = max(10, int(self.lines_per_file * rng.uniform(0.5, 1.5)))
+        function = 0
+        while len(lines) < length:
+            lines.append("")
+            lines.append(f"def handler_{function}(value, limit={rng.randint(1, 100)}):")
+            lines.append(f'    """Handle case {rng.randint(0, 10 ** 6)} of {path}."""')
+            for _ in range(rng.randint(3, 12)):
+                lines.append(f"    value = (value * {rng.randint(2, 97)} + {rng.randint(0, 999)}) % limit")
+            lines.append("    return value")
+            function += 1
+        return "\n".join(lines) + "\n"
+
+    def tree(self) -> RepoTree:
+        entries = []
+        seen_dirs = set()
+        for path in self.paths:
+            parts = path.split("/")
+            for depth in range(1, len(parts)):
+                directory = "/".join(parts[:depth])
+                if directory not in seen_dirs:
+                    seen_dirs.add(directory)
+                    entries.append(TreeEntry(path=directory, type="tree", sha=_digest("tree", directory), size=None))
+            size = self.lines_per_file * 40
+            entries.append(TreeEntry(path=path, type="blob", sha=_digest("blob", self.seed, path), size=size))
+        return RepoTree(commit_sha=self.commit_sha, entries=entries)
+
+
+def _make_patch(rng: random.Random, content: str) -> Tuple[str, int, int]:
+    """A unified diff of a few hunks against `content`, with its added and deleted line counts."""
+    lines = content.splitlines()
+    hunks = []
+    additions = deletions = 0
+    line = 1
+    for _ in range(rng.randint(1, 4)):
+        line += rng.randint(3, max(4, len(lines) // 4))
+        if line >= len(lines):
+            break
+        removed = rng.randint(0, 3)
+        added = rng.randint(1, 6)
+        body = [f"-{text}" for text in lines[line - 1:line - 1 + removed]]
+        body += [f"+    value = guard(value)  # change {rng.randint(0, 10 ** 6)}" for _ in range(added)]
+        hunks.append(f"@@ -{line},{removed} +{line},{added} @@\n" + "\n".join(body))
+        additions += added
+        deletions += len(body) - added
+        line += removed
+    return "\n".join(hunks), additions, deletions
+
+
+def generate_pr(repo: GeneratedRepo, pr_number: int, changed_files: int) -> PRDetails:
+    rng = random.Random(_digest(repo.seed, "pr", pr_number))
+    paths = rng.sample(repo.paths, min(changed_files, len(repo.paths)))
+    files = []
+    for path in paths:
+        content = repo.content(path)
+        patch, additions, deletions = _make_patch(rng, content)
+        files.append(PRFile(
+            filename=path,
+            status="modified",
+            additions=additions,
+            deletions=deletions,
+            changes=additions + deletions,
+            patch=patch,
+            content=content,
+        ))
+    return PRDetails(
+        title=f"Benchmark PR {pr_number}",
+        description="Generated change set",
+        state="open",
+        files=files,
+        diff=f"{repo.url}/pull/{pr_number}.diff",
+        head_sha=_digest("head", repo.url, pr_number),
+    )
+
+
+# --- GitHub -------------------------------------------------------------------
+
+class FakeGithubService:
+    """
+    Serves a GeneratedRepo through the subset of GithubService that the review
+    agent, the review task and the API use. Failed content fetches return None,
+    like GithubService.get_file_content does.
+    """
+
+    def __init__(
+        self,
+        repo: GeneratedRepo,
+        pr_files: int,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+        file_filter: Optional[FileFilter] = None,
+    ):
+        self.repo = repo
+        self.pr_files = pr_files
+        self.knobs = _Knobs(latency, failure_rate, seed)
+        self.file_filter = file_filter if file_filter is not None else FileFilter()
+        self.calls = CallCounter()
+
+    def _call(self, name: str) -> None:
+        self.calls.add(name)
+        self.knobs.wait()
+
+    @contextmanager
+    def task_scope(self) -> Iterator[None]:
+        yield
+
+    def get_branch_head_sha(self, repo_url: str, branch: Optional[str] = None) -> str:
+        self._call("get_branch")
+        return self.repo.commit_sha
+
+    def get_tree_strucutre_and_file_paths(self, repo_url: str, ref: Optional[str] = None):
+        self._call("get_git_tree")
+        tree = self.repo.tree()
+        return tree.render(), tree.filtered_file_paths(self.file_filter)
+
+    def get_file_content(self, repo_url: str, file_path: str, ref: str) -> Optional[str]:
+        self._call("get_contents")
+        if self.knobs.fails():
+            self.calls.add("get_contents_failed")
+            return None
+        return self.repo.content(file_path)
+
+    def iter_file_contents(self, repo_url: str, file_paths: Iterable[str], ref: str) -> Iterator[Tuple[str, Optional[str]]]:
+        for file_path in file_paths:
+            yield file_path, self.get_file_content(repo_url, file_path, ref)
+
+    def get_changed_files(self, repo_url: str, base_sha: str, head_sha: str) -> Optional[List[ChangedFile]]:
+        self._call("compare")
+        return []
+
+    def get_pr_details(self, repo_url: str, pr_number: int) -> PRDetails:
+        # One pulls call, one files page per 30 files, then one content fetch per file.
+        self._call("get_pull")
+        pr_details = generate_pr(self.repo, pr_number, self.pr_files)
+        for _ in range(0, len(pr_details.files), 30):
+            self._call("get_files")
+        for _ in pr_details.files:
+            self._call("get_git_blob")
+        return pr_details
+
+    def get_pr_summary(self, repo_url: str, pr_number: int) -> PRSummary:
+        self._call("get_pull")
+        pr_details = generate_pr(self.repo, pr_number, self.pr_files)
+        return PRSummary(
+            head_sha=pr_details.head_sha,
+            changed_files=len(pr_details.files),
+            additions=sum(file.additions for file in pr_details.files),
+            deletions=sum(file.deletions for file in pr_details.files),
+            repo_size_kb=self.repo.num_files * self.repo.lines_per_file * 40 // 1024,
+        )
+
+
+# --- LLM ----------------------------------------------------------------------
+
+_FILENAME_PATTERN = re.compile(r"^Changed file: (.+)$", re.MULTILINE)
+_HUNK_PATTERN = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)", re.MULTILINE)
+
+
+class FakeChatModel:
+    """
+    Stands in for ChatGoogleGenerativeAI.invoke. Review prompts get one issue per
+    hunk of the file's patch; `malformed_rate` of responses are truncated JSON so
+    the repair path runs; `failure_rate` of calls raise a rate-limit error.
+    Responses carry `usage_metadata`, estimated at four characters per token.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_per_1k_tokens: float = 0.0,
+        failure_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.knobs = _Knobs(latency, failure_rate, seed)
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.malformed_rate = malformed_rate
+        self._malformed = _Knobs(0.0, malformed_rate, seed + 1)
+        self.calls = CallCounter()
+
+    def invoke(self, prompt) -> AIMessage:
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        prompt_tokens = len(text) // 4
+        self.calls.add("invoke")
+        self.knobs.wait(prompt_tokens / 1000 * self.latency_per_1k_tokens)
+        if self.knobs.fails():
+            self.calls.add("rate_limited")
+            raise FakeRateLimitError("429 Resource has been exhausted (fake)")
+
+        if text.startswith("You are given malformed"):
+            self.calls.add("repair")
+            content = json.dumps({"files": [], "summary": {"total_files_changed": 0, "total_issues": 0, "critical_issues": 0}})
+        else:
+            content = self._review(text)
+            if self._malformed.fails():
+                self.calls.add("malformed")
+                content = content[: len(content) // 2]
+
+        completion_tokens = len(content) // 4
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+
+    @staticmethod
+    def _review(prompt: str) -> str:
+        match = _FILENAME_PATTERN.search(prompt)
+        filename = match.group(1).strip() if match else "unknown"
+        issues = [
+            {
+                "filename": filename,
+                "issue_type": "bug" if index % 3 else "critical",
+                "line_number_of_issue": int(line),
+                "issue_description": f"guard() result is not checked at line {line}",
+                "suggestions": "Validate the guarded value before use.",
+            }
+            for index, line in enumerate(_HUNK_PATTERN.findall(prompt))
+        ]
+        return json.dumps({
+            "files": issues,
+            "summary": {
+                "total_files_changed": 1,
+                "total_issues": len(issues),
+                "critical_issues": sum(1 for issue in issues if issue["issue_type"] == "critical"),
+            },
+        })
+
+
+# --- Embeddings -----------------------------------------------------------------
+
+class FakeEmbeddings(Embeddings):
+    """DeterministicFakeEmbedding with per-request and per-text latency, failures and call counts."""
+
+    def __init__(
+        self,
+        size: int = 256,
+        latency: float = 0.0,
+        latency_per_text: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.inner = DeterministicFakeEmbedding(size=size)
+        self.knobs = _Knobs(latency, failure_rate, seed)
+        self.latency_per_text = latency_per_text
+        self.calls = CallCounter()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls.add("embed_documents")
+        self.calls.add("texts", len(texts))
+        self.knobs.wait(len(texts) * self.latency_per_text)
+        if self.knobs.fails():
+            self.calls.add("rate_limited")
+            raise FakeRateLimitError("429 Resource has been exhausted (fake)")
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls.add("embed_query")
+        self.knobs.wait()
+        return self.inner.embed_query(text)
@@ -0,0 +1,394 @@
+"""
+Offline end-to-end benchmark of the review pipeline.
+
+GitHub, the chat model and the embedding model are replaced by the local fakes
+in benchmarks/fakes.py, so runs need no network or credentials and are
+reproducible. One run covers one scenario:
+
+- repository indexing (`setup_repo_context`), then re-opening the same index
+- per-file review (`review_changes`), then aggregation
+- optionally (`--api`), the /analyze-pr submit and /status poll path against an
+  in-process API, with fakeredis standing in for Redis and a thread pool
+  standing in for the Celery workers
+
+The JSON report has wall times, fake API call counts, peak RSS and throughput.
+Peak RSS is per process, so run one scenario per invocation:
+
+    python -m benchmarks.pipeline --scale medium --label main --output before.json
+    python -m benchmarks.pipeline --scale medium --label branch --output after.json
+    python -m benchmarks.pipeline --compare before.json after.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from benchmarks.fakes import SCALES, FakeChatModel, FakeEmbeddings, FakeGithubService, GeneratedRepo
+from app.services.embeddings import EmbeddingStore
+from app.services.metrics import collect_timings
+from app.services.pr_analysis import CodeReviewAgent
+from app.services.result_cache import result_reference
+
+
+REPO_URL = "https://github.com/benchmark/generated"
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _rate(count: float, seconds: float) -> float:
+    return round(count / seconds, 2) if seconds else 0.0
+
+
+def build_scenario(args) -> Dict:
+    repo_files, pr_files, lines_per_file = SCALES[args.scale]
+    repo = GeneratedRepo(
+        url=REPO_URL,
+        num_files=args.repo_files or repo_files,
+        lines_per_file=args.lines_per_file or lines_per_file,
+        seed=args.seed,
+    )
+    github = FakeGithubService(
+        repo,
+        pr_files=args.pr_files or pr_files,
+        latency=args.github_latency,
+        failure_rate=args.github_failure_rate,
+        seed=args.seed,
+    )
+    llm = FakeChatModel(
+        latency=args.llm_latency,
+        latency_per_1k_tokens=args.llm_latency_per_1k_tokens,
+        failure_rate=args.llm_failure_rate,
+        malformed_rate=args.llm_malformed_rate,
+        seed=args.seed,
+    )
+    embeddings = FakeEmbeddings(
+        latency=args.embed_latency,
+        latency_per_text=args.embed_latency_per_text,
+        failure_rate=args.embed_failure_rate,
+        seed=args.seed,
+    )
+
+    work_dir = tempfile.mkdtemp(prefix="review-benchmark-")
+    embedding_store = None
+    if args.embedding_cache:
+        embedding_store = EmbeddingStore(os.path.join(work_dir, "embeddings.sqlite3"), max_rows=10_000_000)
+    agent = CodeReviewAgent(
+        github_service=github,
+        api_key="benchmark",
+        chat_model="fake-chat",
+        embedding_model="fake-embedding",
+        index_dir=None if args.memory_index else os.path.join(work_dir, "index"),
+        review_concurrency=args.review_concurrency,
+        llm_max_retries=args.max_retries,
+        llm_retry_base_delay=args.retry_base_delay,
+        embedding_store=embedding_store,
+        embedding_batch_size=args.embedding_batch_size,
+        embedding_concurrency=args.embedding_concurrency,
+        index_batch_chunks=args.index_batch_chunks,
+        index_queue_size=args.index_queue_size,
+        large_file_lines=args.large_file_lines,
+        hunk_context_lines=args.hunk_context_lines,
+    )
+    # Swap the Gemini clients for the fakes; the index store shares the dedup wrapper.
+    agent.llm = llm
+    agent.embeddings.embeddings = embeddings
+    return {"repo": repo, "github": github, "llm": llm, "embeddings": embeddings, "agent": agent}
+
+
+def run_pipeline(scenario: Dict, pr_number: int = 1) -> Dict:
+    agent: CodeReviewAgent = scenario["agent"]
+    github: FakeGithubService = scenario["github"]
+
+    with collect_timings() as timings:
+        started = time.perf_counter()
+        pr_details = github.get_pr_details(REPO_URL, pr_number)
+        fetched = time.perf_counter()
+        repo_context = agent.setup_repo_context(REPO_URL)
+        indexed = time.perf_counter()
+        review_response = agent.review_changes(pr_details=pr_details, repo_context=repo_context)
+        reviewed = time.perf_counter()
+        review = agent.parse_or_repair_review_response(review_response)
+        finished = time.perf_counter()
+
+    # A second review of the same commit re-opens the stored index.
+    reopen_started = time.perf_counter()
+    agent.setup_repo_context(REPO_URL)
+    reopen_seconds = time.perf_counter() - reopen_started
+
+    index_stats = repo_context.index_stats or {}
+    files_reviewed = len(agent.pending_files(pr_details))
+    return {
+        "fetch_seconds": round(fetched - started, 3),
+        "index_seconds": round(indexed - fetched, 3),
+        "index_reopen_seconds": round(reopen_seconds, 3),
+        "review_seconds": round(reviewed - indexed, 3),
+        "aggregate_seconds": round(finished - reviewed, 3),
+        "wall_seconds": round(finished - started, 3),
+        "files_indexed": len(repo_context.files),
+        "chunks": index_stats.get("chunks", 0),
+        "chunks_embedded": index_stats.get("embedded_chunks", 0),
+        "files_reviewed": files_reviewed,
+        "issues": review.get("summary", {}).get("total_issues", 0),
+        "throughput": {
+            "files_indexed_per_second": _rate(len(repo_context.files), indexed - fetched),
+            "chunks_per_second": _rate(index_stats.get("chunks", 0), indexed - fetched),
+            "files_reviewed_per_second": _rate(files_reviewed, reviewed - indexed),
+        },
+        "stages": timings.as_dict(),
+    }
+
+
+async def _submit_and_poll(app, pr_numbers: List[int], duplicates: int, poll_interval: float, timeout: float) -> Dict:
+    import httpx
+
+    submit_latencies: List[float] = []
+    completion_seconds: List[float] = []
+    polls = 0
+    deduplicated = 0
+    failed = 0
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=timeout) as client:
+        async def submit(pr_number: int) -> Optional[str]:
+            nonlocal deduplicated
+            started = time.perf_counter()
+            response = await client.post("/analyze-pr", json={"repo_url": REPO_URL, "pr_number": pr_number})
+            submit_latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+            body = response.json()
+            if body.get("deduplicated"):
+                deduplicated += 1
+                return None
+            return body["task_id"]
+
+        async def poll(task_id: str, submitted_at: float) -> None:
+            nonlocal polls, failed
+            deadline = submitted_at + timeout
+            while time.perf_counter() < deadline:
+                polls += 1
+                status = (await client.get(f"/status/{task_id}")).json()["status"]
+                if status in ("SUCCESS", "FAILURE"):
+                    failed += status == "FAILURE"
+                    completion_seconds.append(time.perf_counter() - submitted_at)
+                    return
+                await asyncio.sleep(poll_interval)
+            failed += 1
+
+        started = time.perf_counter()
+        submissions = [pr_number for pr_number in pr_numbers for _ in range(duplicates)]
+        task_ids = await asyncio.gather(*(submit(pr_number) for pr_number in submissions))
+        await asyncio.gather(*(poll(task_id, started) for task_id in task_ids if task_id is not None))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "submissions": len(submit_latencies),
+        "tasks": len(completion_seconds),
+        "deduplicated": deduplicated,
+        "failed": failed,
+        "status_polls": polls,
+        "wall_seconds": round(elapsed, 3),
+        "tasks_per_second": _rate(len(completion_seconds), elapsed),
+        "submit_latency_ms": {
+            "p50": round(_percentile(submit_latencies, 50) * 1000, 2),
+            "p95": round(_percentile(submit_latencies, 95) * 1000, 2),
+        },
+        "completion_seconds": {
+            "p50": round(_percentile(completion_seconds, 50), 3),
+            "p95": round(_percentile(completion_seconds, 95), 3),
+        },
+    }
+
+
+def run_api(scenario: Dict, args) -> Dict:
+    """
+    Drive /analyze-pr and /status in process. Submissions go through the real
+    handlers (dedup claim, routing); the Celery hand-off is replaced by a
+    thread pool that runs fetch, index, review and aggregate and writes the
+    task state where the Redis result backend would.
+    """
+    try:
+        import fakeredis
+        from fakeredis import aioredis as fake_aioredis
+    except ImportError:
+        raise SystemExit("--api needs fakeredis (pip install fakeredis)")
+    from fastapi import FastAPI
+    from app.api import endpoints
+    from app.config import get_celery_app
+    from app.services import task_status
+    from app.tasks import full_review_workflow_task
+
+    server = fakeredis.FakeServer()
+    backend = get_celery_app().backend
+    results = fakeredis.FakeRedis(server=server)
+    agent: CodeReviewAgent = scenario["agent"]
+    github: FakeGithubService = scenario["github"]
+    workers = ThreadPoolExecutor(max_workers=args.api_workers)
+
+    def run_task(task_id: str, repo_url: str, pr_number: int) -> None:
+        meta = {"task_id": task_id, "status": "STARTED", "result": None}
+        results.set(backend.get_key_for_task(task_id), json.dumps(meta))
+        try:
+            pr_details = github.get_pr_details(repo_url, pr_number)
+            repo_context = agent.setup_repo_context(repo_url)
+            review = agent.parse_or_repair_review_response(
+                agent.review_changes(pr_details=pr_details, repo_context=repo_context)
+            )
+            result = {"repo_url": repo_url, "pr_number": pr_number, "head_sha": pr_details.head_sha, "pr_review": review}
+            meta.update(status="SUCCESS", result=result_reference(task_id, result))
+        except Exception as e:
+            meta.update(status="FAILURE", result={"exc_message": str(e)})
+        results.set(backend.get_key_for_task(task_id), json.dumps(meta))
+
+    def apply_async(args=None, task_id=None, **options):
+        workers.submit(run_task, task_id, *args)
+
+    def async_redis(redis_url: Optional[str] = None):
+        return fake_aioredis.FakeRedis(server=server)
+
+    patches = [
+        (endpoints, "get_github_service", lambda github_token=None: github),
+        (endpoints, "get_async_redis", async_redis),
+        (task_status, "get_async_redis", async_redis),
+        (full_review_workflow_task, "apply_async", apply_async),
+    ]
+    originals = [(target, name, getattr(target, name)) for target, name, _ in patches]
+    for target, name, value in patches:
+        setattr(target, name, value)
+    try:
+        app = FastAPI()
+        app.include_router(endpoints.router)
+        pr_numbers = list(range(1, args.api_prs + 1))
+        return asyncio.run(_submit_and_poll(app, pr_numbers, args.api_duplicates, args.api_poll_interval, args.api_timeout))
+    finally:
+        for target, name, value in originals:
+            setattr(target, name, value)
+        workers.shutdown(wait=True)
+
+
+def _numeric_leaves(report: Dict, prefix: str = "") -> Dict[str, float]:
+    leaves = {}
+    for key, value in report.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            leaves.update(_numeric_leaves(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            leaves[path] = value
+    return leaves
+
+
+def compare(before_path: str, after_path: str) -> Dict:
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    before_values, after_values = _numeric_leaves(before), _numeric_leaves(after)
+    changes = {}
+    for key in sorted(set(before_values) & set(after_values)):
+        old, new = before_values[key], after_values[key]
+        changes[key] = [old, new, round(new / old, 3) if old else None]
+    return {"before": before.get("label"), "after": after.get("label"), "metrics": changes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of indexing, review and the API path")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--repo-files", type=int, help="Override the scale's repository size")
+    parser.add_argument("--pr-files", type=int, help="Override the scale's changed files per PR")
+    parser.add_argument("--lines-per-file", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+
+    parser.add_argument("--github-latency", type=float, default=0.0, help="Seconds per GitHub call")
+    parser.add_argument("--github-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per LLM call")
+    parser.add_argument("--llm-latency-per-1k-tokens", type=float, default=0.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="Share of LLM calls rate-limited")
+    parser.add_argument("--llm-malformed-rate", type=float, default=0.0, help="Share of reviews needing a repair call")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Seconds per embedding request")
+    parser.add_argument("--embed-latency-per-text", type=float, default=0.0)
+    parser.add_argument("--embed-failure-rate", type=float, default=0.0)
+
+    parser.add_argument("--review-concurrency", type=int, default=4)
+    parser.add_argument("--embedding-batch-size", type=int, default=100)
+    parser.add_argument("--embedding-concurrency", type=int, default=4)
+    parser.add_argument("--embedding-cache", action="store_true", help="Use a SQLite embedding store")
+    parser.add_argument("--index-batch-chunks", type=int, default=1000)
+    parser.add_argument("--index-queue-size", type=int, default=32)
+    parser.add_argument("--memory-index", action="store_true", help="In-memory index instead of an index directory")
+    parser.add_argument("--large-file-lines", type=int, default=1000, help="0 reviews every file whole")
+    parser.add_argument("--hunk-context-lines", type=int, default=40)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--retry-base-delay", type=float, default=0.01)
+
+    parser.add_argument("--api", action="store_true", help="Also benchmark the submit/poll API path")
+    parser.add_argument("--api-prs", type=int, default=20)
+    parser.add_argument("--api-duplicates", type=int, default=2, help="Submissions per PR")
+    parser.add_argument("--api-workers", type=int, default=4)
+    parser.add_argument("--api-poll-interval", type=float, default=0.05)
+    parser.add_argument("--api-timeout", type=float, default=600.0)
+
+    parser.add_argument("--label", default="")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        return
+
+    # The services log progress with print(); keep stdout for the report.
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmark(args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    print(output)
+
+
+def run_benchmark(args) -> Dict:
+    scenario = build_scenario(args)
+    report = {
+        "label": args.label,
+        "scenario": {
+            "scale": args.scale,
+            "repo_files": scenario["repo"].num_files,
+            "pr_files": scenario["github"].pr_files,
+            "seed": args.seed,
+            "memory_index": args.memory_index,
+            "review_concurrency": args.review_concurrency,
+        },
+        "pipeline": run_pipeline(scenario),
+    }
+    if args.api:
+        report["api"] = run_api(scenario, args)
+    report["calls"] = {
+        "github": scenario["github"].calls.snapshot(),
+        "llm": scenario["llm"].calls.snapshot(),
+        "embeddings": scenario["embeddings"].calls.snapshot(),
+    }
+    report["peak_rss_mb"] = _peak_rss_mb()
+    return report
+
+
+if __name__ == "__main__":
+    main()